@@ -0,0 +1,131 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from metrics import normalize_description
+from transactions import TRANSACTION_COLUMNS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    account_id TEXT NOT NULL,
+    txn_hash TEXT NOT NULL,
+    month TEXT NOT NULL,
+    date TEXT NOT NULL,
+    description TEXT,
+    amount REAL NOT NULL,
+    balance REAL,
+    direction TEXT,
+    category TEXT,
+    statement_sha256 TEXT,
+    PRIMARY KEY (account_id, txn_hash)
+);
+CREATE INDEX IF NOT EXISTS transactions_month ON transactions (account_id, month);
+CREATE TABLE IF NOT EXISTS statements (
+    account_id TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    added_at REAL NOT NULL,
+    new_transactions INTEGER NOT NULL,
+    PRIMARY KEY (account_id, sha256)
+);
+CREATE TABLE IF NOT EXISTS month_summaries (
+    account_id TEXT NOT NULL,
+    month TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    PRIMARY KEY (account_id, month)
+);
+"""
+
+
+def transaction_hashes(frame):
+    """Stable per-row identity used to de-duplicate overlapping statements.
+
+    Identical rows inside one statement (two equal coffees on the same day) are
+    kept apart by their occurrence number, so they are not collapsed into one.
+    """
+    keys = pd.DataFrame({
+        "date": frame["date"].dt.strftime("%Y-%m-%d"),
+        "description": normalize_description(frame["description"]).values,
+        "amount": frame["amount"].round(2).map("{:.2f}".format).values,
+    })
+    keys["occurrence"] = keys.groupby(["date", "description", "amount"]).cumcount().astype(str)
+    joined = keys["date"] + "|" + keys["description"] + "|" + keys["amount"] + "|" + keys["occurrence"]
+    return [hashlib.sha256(key.encode("utf-8")).hexdigest() for key in joined]
+
+
+class AccountStore:
+    """Append-only SQLite history of each account's transactions and per-month summaries."""
+
+    def __init__(self, path="accounts.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def has_statement(self, account_id, sha256):
+        with self._connect() as conn:
+            row = conn.execute("SELECT 1 FROM statements WHERE account_id = ? AND sha256 = ?",
+                               (account_id, sha256)).fetchone()
+        return row is not None
+
+    def add_statement(self, account_id, sha256, frame):
+        """Append transactions not seen before and return the months that changed."""
+        if frame.empty:
+            rows = []
+        else:
+            hashes = transaction_hashes(frame)
+            rows = list(zip(
+                [account_id] * len(frame), hashes,
+                frame["date"].dt.strftime("%Y-%m").tolist(), frame["date"].dt.strftime("%Y-%m-%d").tolist(),
+                frame["description"].astype(str).tolist(), frame["amount"].astype(float).tolist(),
+                [None if pd.isna(v) else float(v) for v in frame["balance"]],
+                frame["direction"].tolist(), [None if pd.isna(v) else v for v in frame["category"]],
+                [sha256] * len(frame),
+            ))
+
+        with self._lock, self._connect() as conn:
+            before = conn.total_changes
+            changed = set()
+            for row in rows:
+                cursor = conn.execute("INSERT OR IGNORE INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+                if cursor.rowcount:
+                    changed.add(row[2])
+            added = conn.total_changes - before
+            conn.execute("INSERT OR REPLACE INTO statements VALUES (?, ?, ?, ?)", (account_id, sha256, time.time(), added))
+        return sorted(changed)
+
+    def months(self, account_id):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT DISTINCT month FROM transactions WHERE account_id = ? ORDER BY month",
+                                (account_id,)).fetchall()
+        return [month for (month,) in rows]
+
+    def load_transactions(self, account_id, months=None):
+        query = "SELECT date, description, amount, balance, direction, category FROM transactions WHERE account_id = ?"
+        params = [account_id]
+        if months is not None:
+            months = list(months)
+            query += f" AND month IN ({', '.join('?' * len(months))})"
+            params.extend(months)
+        with self._connect() as conn:
+            frame = pd.read_sql_query(query + " ORDER BY date", conn, params=params)
+        frame["date"] = pd.to_datetime(frame["date"])
+        frame["table"] = 0
+        return frame[TRANSACTION_COLUMNS]
+
+    def month_summaries(self, account_id):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT month, content_hash, summary FROM month_summaries WHERE account_id = ?",
+                                (account_id,)).fetchall()
+        return {month: (content_hash, summary) for month, content_hash, summary in rows}
+
+    def save_month_summary(self, account_id, month, content_hash, summary):
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO month_summaries VALUES (?, ?, ?, ?)",
+                         (account_id, month, content_hash, summary))
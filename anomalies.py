@@ -0,0 +1,140 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from metrics import FEE_PATTERN, normalize_description
+
+GAMBLING_PATTERN = re.compile(
+    r"casino|gambl|betting|\bbet\b|bet365|betfair|betway|sportsbet|draftkings|fanduel|pokerstars|\bpoker\b|"
+    r"lottery|lotto|william hill|paddy power|ladbrokes|skybet|sky bet|bingo", re.IGNORECASE)
+CASH_ADVANCE_PATTERN = re.compile(
+    r"\b(?:cash advance|cash adv|payday|pay day loan|quick ?quid|wonga|moneygram|cash app borrow|dave advance|"
+    r"earnin|brigit|advance america)\b", re.IGNORECASE)
+# Credits only count as cash advances when they say so; lender names alone also appear on ordinary deposits
+ADVANCE_CREDIT_PATTERN = re.compile(r"\b(?:cash advance|payday|pay day loan)\b", re.IGNORECASE)
+ANOMALY_COLUMNS = ["date", "description", "amount", "kind", "detail", "score"]
+# Score of a flag that is a red flag by definition rather than by degree
+CERTAIN = 10.0
+
+
+def robust_scores(amounts, groups):
+    """Robust z-score of each amount within its group, using the median and MAD.
+
+    Groups whose MAD is zero (identical amounts with a few exceptions) fall
+    back to the IQR scale, and groups without any spread score zero.
+    """
+    grouped = amounts.groupby(groups)
+    median = grouped.transform("median")
+    mad = (amounts - median).abs().groupby(groups).transform("median")
+    iqr = grouped.transform("quantile", 0.75) - grouped.transform("quantile", 0.25)
+    # 1.4826 * MAD and IQR / 1.349 both estimate the standard deviation of normal data
+    scale = (1.4826 * mad).where(mad > 0, iqr / 1.349)
+    scores = (amounts - median) / scale.where(scale > 0)
+    return scores.fillna(0.0)
+
+
+def _outliers(debits, z_threshold, min_group):
+    amounts = debits["amount"].abs()
+    payees = normalize_description(debits["description"]).to_numpy()
+    # From broadest to most specific; each debit is judged against the most specific group with enough history,
+    # so a large rent payment is compared with earlier rent rather than with coffee
+    scopes = [("statement", np.zeros(len(debits), dtype="int64"))]
+    if debits["category"].notna().any():
+        scopes.append(("category", debits["category"].fillna("Uncategorized").to_numpy()))
+    scopes.append(("merchant", payees))
+
+    best = pd.Series(0.0, index=debits.index)
+    best_scope = pd.Series("", index=debits.index, dtype=str)
+    for scope, groups in scopes:
+        keys = pd.Series(groups, index=debits.index)
+        sized = keys.map(keys.value_counts()) >= min_group
+        best = robust_scores(amounts, keys).where(sized, best)
+        best_scope = best_scope.where(~sized, scope)
+
+    # Only unusually large debits matter to a lender; small ones score negative and are ignored
+    flagged = best >= z_threshold
+    rows = debits[flagged]
+    if rows.empty:
+        return rows
+    return rows.assign(kind="outlier", score=best[flagged].round(1),
+                       detail="robust z " + best[flagged].round(1).astype(str) + " within " + best_scope[flagged])
+
+
+def _duplicates(debits, window_days):
+    """Debits repeating the same payee and amount within window_days of each other."""
+    keyed = debits.assign(payee=normalize_description(debits["description"]).to_numpy()).sort_values(
+        ["payee", "amount", "date"], kind="stable")
+    same = (keyed["payee"] == keyed["payee"].shift()) & (keyed["amount"] == keyed["amount"].shift())
+    gap = keyed["date"].diff().dt.days
+    repeat = same & (gap <= window_days)
+    rows = keyed[repeat]
+    if rows.empty:
+        return rows
+    return rows.assign(kind="duplicate", score=CERTAIN / 2,
+                       detail="same payee and amount " + gap[repeat].astype(int).astype(str) + " day(s) earlier")
+
+
+def _balance_drops(frame, drop_fraction, min_drop):
+    """Single transactions that took a positive balance negative, or cut it by drop_fraction of both
+    the previous balance and the account's typical balance."""
+    balances = frame["balance"]
+    previous = balances.shift()
+    drop = previous - balances
+    # Relative to the typical balance, so an account that routinely spends down to zero is not flagged every month
+    typical = balances[balances > 0].median()
+    large = (drop >= previous * drop_fraction) & (drop >= typical * drop_fraction)
+    mask = (previous > 0) & (drop >= min_drop) & ((balances < 0) | large)
+    rows = frame[mask.fillna(False)]
+    if rows.empty:
+        return rows
+    share = (drop[rows.index] / previous[rows.index] * 100).round(0)
+    return rows.assign(kind="balance_drop", score=(share / 10).clip(upper=CERTAIN),
+                       detail="balance " + previous[rows.index].round(2).astype(str) + " -> "
+                              + balances[rows.index].round(2).astype(str) + " (" + share.astype(int).astype(str) + "% drop)")
+
+
+def detect_anomalies(frame, z_threshold=3.5, min_group=5, duplicate_days=1, drop_fraction=0.5, min_drop=100.0):
+    """Flag risk signals across a whole transaction frame in one vectorized pass.
+
+    Returns one row per flag with the transaction, its kind (outlier,
+    duplicate, nsf_fee, gambling, cash_advance, balance_drop), a short detail
+    and a score used to rank flags; a transaction can carry several flags.
+    """
+    if frame is None or frame.empty:
+        return pd.DataFrame(columns=ANOMALY_COLUMNS)
+    frame = frame.dropna(subset=["amount"])
+    descriptions = frame["description"].fillna("").astype(str)
+    debits = frame[frame["amount"] < 0]
+
+    flags = [
+        _outliers(debits, z_threshold, min_group),
+        _duplicates(debits.dropna(subset=["date"]), duplicate_days),
+        debits[descriptions[debits.index].str.contains(FEE_PATTERN)].assign(kind="nsf_fee", score=CERTAIN, detail="overdraft/NSF fee"),
+        frame[descriptions.str.contains(GAMBLING_PATTERN)].assign(kind="gambling", score=CERTAIN / 2,
+                                                                   detail="gambling merchant"),
+        frame[(descriptions.str.contains(CASH_ADVANCE_PATTERN) & (frame["amount"] < 0))
+              | descriptions.str.contains(ADVANCE_CREDIT_PATTERN)].assign(kind="cash_advance", score=CERTAIN / 2,
+                                                                          detail="cash advance / payday lender"),
+    ]
+    if frame["balance"].notna().any():
+        flags.append(_balance_drops(frame, drop_fraction, min_drop))
+
+    flags = [flag[ANOMALY_COLUMNS] for flag in flags if not flag.empty]
+    if not flags:
+        return pd.DataFrame(columns=ANOMALY_COLUMNS)
+    return pd.concat(flags).sort_values(["score", "date"], ascending=[False, True], kind="stable").reset_index(drop=True)
+
+
+def format_anomalies(anomalies, limit=15):
+    """Render flags as a compact block for LLM prompts: counts per kind, then the highest-scoring flags."""
+    if anomalies is None or anomalies.empty:
+        return "Red flags: none detected."
+    counts = anomalies["kind"].value_counts()
+    lines = ["Red flags: " + ", ".join(f"{count} {kind}" for kind, count in counts.items())]
+    for row in anomalies.head(limit).itertuples():
+        date = row.date.strftime("%Y-%m-%d") if pd.notna(row.date) else "unknown date"
+        lines.append(f"- {date} {row.description} {row.amount:,.2f}: {row.kind}, {row.detail}")
+    if len(anomalies) > limit:
+        lines.append(f"- ... and {len(anomalies) - limit} more")
+    return "\n".join(lines)
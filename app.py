@@ -1,48 +1,35 @@
 import streamlit as st
-from bank_statement_parser import BankStatementParser
-from bank_statement_analyzer import BankStatementAnalyzer
+from result_cache import ResultCache
+from job_queue import JOB_STAGES, attach_result, shared_queue
+from job_worker import start_local_workers
+from tracing import tracer
+from display import load_table, paginated_dataframe
 import os
-import pandas as pd
-import shutil
-from contextlib import contextmanager
+import time
 
 
 
 st.set_page_config(page_title="Bank Statement Analyzer", layout="wide")
 
 
-def cleanup_temp_directories():
-    """Clean up any existing temporary directories."""
-    temp_dirs = ['temp', 'temp/tables']
-    for dir_path in temp_dirs:
-        if os.path.exists(dir_path):
-            try:
-                shutil.rmtree(dir_path)
-            except Exception as e:
-                print(f"Error cleaning up {dir_path}: {e}")
-
-@contextmanager
-def temporary_directory():
-    """Create a temporary directory and clean it up when done."""
-    os.makedirs("temp", exist_ok=True)
-    os.makedirs("temp/tables", exist_ok=True)
-    try:
-        yield "temp"
-    finally:
-        cleanup_temp_directories()
-
-def parse_markdown_table(markdown_text):
-    lines = markdown_text.strip().split('\n')
-    headers = [col.strip() for col in lines[0].split('|')[1:-1]]
-    data_lines = lines[2:]
-    data = [[cell.strip() for cell in line.split('|')[1:-1]] for line in data_lines if len(line.split('|')[1:-1]) == len(headers)]
-    return pd.DataFrame(data, columns=headers)
+@st.cache_resource
+def get_job_queue():
+    """Start the local worker pool once per server; set JOB_WORKERS=0 when workers run elsewhere."""
+    queue = shared_queue()
+    start_local_workers(int(os.environ.get("JOB_WORKERS", 1)), queue.path, queue.workspaces.root)
+    return queue
+
+@st.cache_resource
+def get_result_cache():
+    """Share one on-disk result cache across sessions so hit/miss counts accumulate."""
+    return ResultCache("cache")
 
 # Initialize session state variables
 for key, default_value in {
     'processed': False,
     'file_uploaded': False,
-    'tables': [],
+    'table_paths': [],
+    'transactions_path': None,
     'final_summary': "",
     'chat_messages': [{'role': "bot", 'content': "Hello, welcome to chat!"}],
     'waiting_for_response': False  # Prevents flickering & ensures first message works
@@ -50,38 +37,74 @@ for key, default_value in {
     if key not in st.session_state:
         st.session_state[key] = default_value
 
+queue = get_job_queue()
+
 st.title("📊 Bank Statement Analyzer")
 
+account_id = st.text_input("Account ID (optional)", help="Statements uploaded under the same ID build up a 24 month history.")
 uploaded_file = st.file_uploader("Upload Bank Statement (PDF)", type=["pdf"])
 
 if uploaded_file and not st.session_state['processed']:
     st.session_state['processed'] = True  # Prevent re-processing
     st.session_state['file_uploaded'] = True
-    with st.spinner('Processing your file...'):
-        with temporary_directory() as temp_dir:
-            file_path = os.path.join(temp_dir, uploaded_file.name)
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-
-            parser = BankStatementParser(api_key="input-your-key")
-            tables = parser.parse_statement(file_path, os.path.join(temp_dir, "tables"))
-
-            analyzer = BankStatementAnalyzer()
-            output_file = analyzer.analyze_tables(os.path.join(temp_dir, "tables"), os.path.join(temp_dir, "result.txt"))
-            with open(output_file, "r", encoding="utf-8") as out_file:
-                st.session_state['chat_file'] = out_file.read()
-            final_summary = analyzer.generate_final_summary(output_file)
-
-            st.session_state['tables'] = tables
-            st.session_state['final_summary'] = final_summary  
-
-if st.session_state['tables']:
-    with st.expander("📄 Extracted Tables", expanded=False):
-        for i, table in enumerate(st.session_state['tables'], 1):
-            st.subheader(f"Table {i}")
-            df = parse_markdown_table(table)
-            st.dataframe(df, use_container_width=True)
+    # The pipeline runs in a worker process, so reruns and disconnects no longer lose the work
+    with tracer.span("upload_write", bytes=uploaded_file.size):
+        job_id = queue.submit(uploaded_file.getvalue(), uploaded_file.name, account_id.strip())
+    st.session_state['job_id'] = job_id
+    st.query_params['job'] = job_id
+
+job_id = st.session_state.get('job_id') or st.query_params.get('job')
+polling = False
+if job_id:
+    job = attach_result(st.session_state, queue, job_id)
+    if job is None:
+        st.warning(f"Job {job_id} was not found.")
+    elif job['status'] in ('queued', 'running'):
+        polling = True
+        stages = [stage for stage in JOB_STAGES if stage != 'history' or job['account_id']]
+        done = sum(job['stages'].get(stage, {}).get('status') == 'done' for stage in stages)
+        label = "Waiting for a worker..." if job['status'] == 'queued' else f"Processing your file: {job['stage'] or 'starting'}..."
+        with st.status(label, expanded=True):
+            st.progress(done / len(stages))
+            for stage in stages:
+                status = job['stages'].get(stage, {}).get('status', 'pending')
+                st.write(f"{'✅' if status == 'done' else '⏳' if status == 'running' else '▫️'} {stage.replace('_', ' ')}")
+            st.caption(f"Job ID: {job_id}")
+    elif job['status'] == 'failed':
+        st.error(f"Processing failed: {job['error']}")
+    elif job['status'] == 'expired':
+        st.warning("The results of this job have expired. Please upload the statement again.")
+
+if st.session_state['table_paths']:
+    with tracer.span("table_render"), st.expander("📄 Extracted Tables", expanded=False):
+        paths = st.session_state['table_paths']
+        # Only the selected table is read from disk, so long statements render as quickly as short ones
+        i = st.selectbox("Table", range(len(paths)), format_func=lambda i: f"Table {i + 1}")
+        table = load_table(paths[i], st.session_state['transactions_path'], st.session_state['transactions_hash'], i)
+        paginated_dataframe(table, f"table_{i}")
 
 if st.session_state['final_summary']:
     with st.expander("📊 AI Summary & Loan Decision", expanded=False):
-        st.write(st.session_state['final_summary'])
\ No newline at end of file
+        st.write(st.session_state['final_summary'])
+
+if st.session_state.get('red_flags'):
+    with st.expander("🚩 Red Flags", expanded=False):
+        st.text(st.session_state['red_flags'])
+
+with st.sidebar.expander("⚡ Result Cache", expanded=False):
+    stats = get_result_cache().stats()
+    job_stats = st.session_state.get('cache_stats') or {}
+    if job_stats:
+        lookups = job_stats['hits'] + job_stats['misses']
+        st.metric("Hit rate (this statement)", f"{job_stats['hits'] / lookups if lookups else 0:.0%}")
+        st.write(f"Hits: {job_stats['hits']} · Misses: {job_stats['misses']}")
+    st.write(f"Entries: {stats['entries']} · Size: {stats['bytes'] / 1024:.1f} KB")
+
+if st.session_state.get('chunk_stats'):
+    with st.sidebar.expander("🧩 Summary Chunks", expanded=False):
+        st.dataframe([{"Tables": ", ".join(chunk["tables"]), "Tokens": chunk["tokens"]}
+                      for chunk in st.session_state['chunk_stats']], hide_index=True)
+
+if polling:
+    time.sleep(1)
+    st.rerun()
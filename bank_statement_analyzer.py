@@ -1,58 +1,343 @@
-from langchain_ollama import OllamaLLM
+from model_router import ModelRouter, Route, parse_structured, shared_router, small_model
+from result_cache import hash_text, make_key
+from transactions import TRANSACTIONS_FILE, frame_to_prompt, iter_transaction_tables
+from metrics import compute_metrics, format_fact_sheet
+from anomalies import detect_anomalies, format_anomalies
+from chunking import estimate_tokens, iter_chunks, pack_tables, token_budget
+from chat_index import split_summaries
+from prompts import assemble
+from tracing import traced, tracer
 import os
 import re
-from concurrent.futures import ThreadPoolExecutor
+import threading
+from collections import deque
+from concurrent.futures import Future
+from itertools import groupby
+
+SUMMARY_PROMPT = (
+    "Imagine you are a bank statement analyzer. "
+    "I have given you one or more tables from a bank statement. "
+    "Summarize the transactions in these tables. Identify income, debt, spending habits, "
+    "and concerning transactions."
+    "Include amounts for each section as evidence."
+    "Don't make it too long and only have the important details. No fluff. "
+    "Answer in JSON with the fields income, debt, spending and concerns."
+)
+
+CONDENSE_PROMPT = (
+    "Below are summaries of consecutive periods of one bank statement. "
+    "Condense them into a single summary of the whole span that keeps income, debt payments, "
+    "spending habits and concerning transactions, with the amounts that support them. "
+    "Use at most 200 words. No fluff. "
+    "Answer in JSON with the fields income, debt, spending and concerns."
+)
+SUMMARY_FIELDS = {"income": "Income", "debt": "Debt", "spending": "Spending", "concerns": "Concerning"}
+SUMMARY_SCHEMA = {
+    "type": "object",
+    "properties": {field: {"type": "string"} for field in SUMMARY_FIELDS},
+    "required": list(SUMMARY_FIELDS),
+}
+PERIOD_LABEL = re.compile(r"^\d{4}-\d{2}$")
+# Money rather than any digit, so a summary quoting only dates or years does not pass as evidence
+MONEY = re.compile(r"[£$€₹]\s?\d[\d,]*|\d[\d,]*\.\d{2}\b")
+
+
+def valid_summary(text):
+    """A usable summary is non-trivial and quotes at least one amount, as SUMMARY_PROMPT asks.
+
+    For a JSON summary only the field values count, not the field names.
+    """
+    summary = parse_structured(text, SUMMARY_SCHEMA)
+    if summary is not None:
+        text = " ".join(summary[field] for field in SUMMARY_FIELDS)
+    return len(text.strip()) >= 40 and MONEY.search(text) is not None
+
+
+def render_summary(response):
+    """Turn a JSON summary into the labelled lines written to the result file.
+
+    Responses that are not a valid summary (such as cached prose from
+    before summaries were structured) are kept as they are.
+    """
+    summary = parse_structured(response, SUMMARY_SCHEMA)
+    if summary is None:
+        return response.strip()
+    return "\n".join(f"{label}: {summary[field].strip()}" for field, label in SUMMARY_FIELDS.items())
+
+
+def period_range(labels):
+    """Span label covering consecutive period labels such as 2023-01 or 2023-01..2023-03."""
+    labels = [re.sub(r" \(part \d+/\d+\)$", "", label) for label in labels]
+    first, last = labels[0].split("..")[0], labels[-1].split("..")[-1]
+    return first if first == last else f"{first}..{last}"
+
+class CachingFuture:
+    """A Future whose result is handed to remember once, by the first thread that reads it."""
+
+    def __init__(self, future, remember):
+        self.future = future
+        self._remember = remember
+        self._lock = threading.Lock()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        response = self.future.result(timeout)
+        with self._lock:
+            remember, self._remember = self._remember, None
+        if remember is not None:
+            remember(response)
+        return response
+
 
 class BankStatementAnalyzer:
-    def __init__(self, summary_model = "gemma2:9b", reasoning_model = "phi4"):
-        self.summary_llm = OllamaLLM(model=summary_model, num_ctx = 4096)
-        self.reasoning_llm = OllamaLLM(model=reasoning_model, num_ctx = 8192)
+    def __init__(self, summary_model = "gemma2:9b", reasoning_model = "phi4", cache=None, client=None, chunk_tokens=None, window=None,
+                 router=None, fast_model=None):
+        # The router is shared so its endpoints' in-flight limits cover every analyzer in the process
+        self.router = router or (ModelRouter([client]) if client else shared_router())
+        # Short chunks go to the fast model first; summaries without any figures are redone by summary_model
+        self.summary_llm = Route("summary", summary_model, fast_model or small_model(), num_ctx=4096,
+                                 validate=valid_summary, schema=SUMMARY_SCHEMA)
+        self.reasoning_llm = Route("decision", reasoning_model, num_ctx=8192)
+        self.cache = cache
+        # Token budget per summary chunk; None derives it from the summary model's num_ctx
+        self.chunk_tokens = chunk_tokens
+        # Summary chunks in flight or awaiting their turn to be written; None means twice the client's limit
+        self.window = window
+        self.chunk_stats = []
+        self.red_flags = None
+
+    def invoke_many(self, llm, prompt, contents):
+        results = [None] * len(contents)
+        keys = [None] * len(contents)
+        if self.cache is not None:
+            for i, content in enumerate(contents):
+                # Key on the content hash separately so identical tables hit across statements
+                keys[i] = make_key("llm", llm.model, llm.num_ctx, prompt, hash_text(content))
+                results[i] = self.cache.get(keys[i])
+
+        missing = [i for i, result in enumerate(results) if result is None]
+        with tracer.span("llm_batch", model=llm.model, calls=len(missing), cache_hits=len(contents) - len(missing)):
+            responses = self.router.invoke_many(llm, [assemble(prompt, content=contents[i]) for i in missing])
+        for i, response in zip(missing, responses):
+            results[i] = response
+            # A response the router gave up on is still used, but not cached, so the next upload asks again
+            if self.cache is not None and llm.check(response):
+                self.cache.set(keys[i], response)
+        return results
+
+    def invoke(self, llm, prompt, content):
+        return self.invoke_many(llm, prompt, [content])[0]
+
+    def submit(self, llm, prompt, content):
+        """Start one cached LLM call and return a Future for its response.
+
+        A fresh response is cached when its result() is first read, on the
+        caller's thread; a done-callback would run on the LLM client's event
+        loop, where cache writes and eviction scans stall every other request.
+        """
+        key = None
+        if self.cache is not None:
+            key = make_key("llm", llm.model, llm.num_ctx, prompt, hash_text(content))
+            cached = self.cache.get(key)
+            if cached is not None:
+                future = Future()
+                future.set_result(cached)
+                return future
+        future = self.router.submit(llm, assemble(prompt, content=content))
+        if key is None:
+            return future
+
+        def remember(response):
+            if llm.check(response):
+                self.cache.set(key, response)
+        return CachingFuture(future, remember)
         
+    def summary_budget(self, prompt):
+        """Tokens of table content per summary call.
+
+        Small tables are packed together and large ones split so each call
+        fills, but never overflows, num_ctx. With a small model, chunks are
+        packed to what it accepts instead; packing to the large model's
+        context would put every full chunk past small_tokens, so the small
+        tier would only ever see the last one.
+        """
+        if self.chunk_tokens:
+            return self.chunk_tokens
+        budget = token_budget(self.summary_llm.num_ctx, prompt)
+        small_budget = self.summary_llm.small_budget(prompt)
+        return min(budget, small_budget) if small_budget else budget
+
     def get_sorted_files(self, folder_path):
-        files = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if os.path.isfile(os.path.join(folder_path, f))]
+        files = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.endswith(".md") and os.path.isfile(os.path.join(folder_path, f))]
         files.sort(key=lambda x: [int(num) if num.isdigit() else num for num in re.split(r'(\d+)', x)])
         return files
     
+    def folder_tables(self, folder_path):
+        """Stream (label, markdown, rows) for each saved table, reading one table at a time."""
+        path = os.path.join(folder_path, TRANSACTIONS_FILE)
+        typed = iter_transaction_tables(path) if os.path.exists(path) else iter(())
+        current = next(typed, None)
+        for cur_file in self.get_sorted_files(folder_path):
+            match = re.search(r'table(\d+)\.md$', cur_file)
+            index = int(match.group(1)) if match else None
+            while current is not None and index is not None and current[0] < index:
+                current = next(typed, None)
+            rows = current[1] if current is not None and current[0] == index else None
+            markdown = None
+            if rows is None:
+                with open(cur_file, "r", encoding="utf-8") as file:
+                    markdown = file.read()
+            yield os.path.basename(cur_file), markdown, rows
+
+    def table_prompts(self, tables):
+        for label, markdown, rows in tables:
+            # Typed rows render as compact CSV, much shorter than the markdown table
+            yield label, frame_to_prompt(rows) if rows is not None else markdown
+
     def analyze_tables(self, folder_path, output_file):
-        files = self.get_sorted_files(folder_path)
-        # ans = []
-        tables = []
-        
-        for cur_file in files:
-            with open(cur_file, "r", encoding="utf-8") as file:
-                markdown_content = file.read()
-                tables.append((cur_file, markdown_content))
-        
-        # Define LLM processing function
-        def process_table(file_data):
-            cur_file, markdown_content = file_data
-            prompt = (
-                "Imagine you are a bank statement analyzer. "
-                "I have given you a table from a bank statement. "
-                "Summarize the transactions in this table. Identify income, debt, spending habits, "
-                "and concerning transactions."
-                "Include amounts for each section as evidence."
-                "Don't make it too long and only have the important details. No fluff."
-            )
-            response = self.summary_llm.invoke(f"{prompt}\n\n{markdown_content}")
-            print("ONE:")
-            print(response, '\n\n\n\n')
-            return f"File: {cur_file}\n{response}\n\n"
-
-        # Run LLM calls in parallel
-        with ThreadPoolExecutor() as executor:
-            results = list(executor.map(process_table, tables))
-        
+        return self.summarize_tables(self.folder_tables(folder_path), output_file)
+
+    @traced("analyze_tables")
+    def summarize_tables(self, tables, output_file):
+        """Summarize (label, markdown, rows) tables as they arrive and write the results in order.
+
+        Each chunk is submitted as soon as it is full, so summarizing overlaps
+        with whatever produces the tables (such as a page-by-page parse). At
+        most window chunks are held at once, so memory stays flat however
+        long the statement is.
+        """
+        prompt = SUMMARY_PROMPT
+        budget = self.summary_budget(prompt)
+        window = self.window or self.router.max_in_flight * 2
+        self.chunk_stats = []
+
         os.makedirs(os.path.dirname(output_file), exist_ok=True)
         with open(output_file, "w", encoding="utf-8") as out_file:
-            out_file.writelines(results)
-        
+            in_flight = deque()
+            for chunk in iter_chunks(self.table_prompts(tables), budget):
+                self.chunk_stats.append({"tables": chunk["labels"], "tokens": chunk["tokens"]})
+                in_flight.append((chunk["labels"], self.submit(self.summary_llm, prompt, chunk["text"])))
+                if len(in_flight) >= window:
+                    labels, future = in_flight.popleft()
+                    out_file.write(f"File: {', '.join(labels)}\n{render_summary(future.result())}\n\n")
+            while in_flight:
+                labels, future = in_flight.popleft()
+                out_file.write(f"File: {', '.join(labels)}\n{render_summary(future.result())}\n\n")
+
         return output_file
-    
-    
-    def generate_final_summary(self, output_file):
+
+    @traced("assess_account")
+    def assess_account(self, store, account_id, output_file, max_months=24):
+        """Assess up to max_months of an account's stored history.
+
+        Each month is summarized once and the summary is kept in the store with
+        a hash of that month's transactions; only months whose transactions
+        changed since the last assessment go back to the LLM.
+        """
+        months = store.months(account_id)[-max_months:]
+        history = store.load_transactions(account_id, months)
+        stored = store.month_summaries(account_id)
+        budget = self.summary_budget(SUMMARY_PROMPT)
+
+        summaries = {}
+        stale = []
+        for month, rows in history.groupby(history["date"].dt.strftime("%Y-%m")):
+            content = frame_to_prompt(rows)
+            content_hash = hash_text(content)
+            if month in stored and stored[month][0] == content_hash:
+                summaries[month] = stored[month][1]
+            else:
+                stale.append((month, content_hash, pack_tables([(month, content)], budget)))
+
+        chunks = [chunk for _, _, month_chunks in stale for chunk in month_chunks]
+        responses = iter(self.invoke_many(self.summary_llm, SUMMARY_PROMPT, [chunk["text"] for chunk in chunks]))
+        for month, content_hash, month_chunks in stale:
+            summary = "\n\n".join(render_summary(next(responses)) for _ in month_chunks)
+            store.save_month_summary(account_id, month, content_hash, summary)
+            summaries[month] = summary
+        self.chunk_stats = [{"tables": chunk["labels"], "tokens": chunk["tokens"]} for chunk in chunks]
+
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        with open(output_file, "w", encoding="utf-8") as out_file:
+            out_file.writelines(f"File: {month}\n{summaries[month]}\n\n" for month in sorted(summaries))
+
+        return self.generate_final_summary(output_file, history)
+
+    def summary_periods(self, blocks, transactions=None):
+        """Month each result block covers: its own label for account history, else its tables' earliest month."""
+        table_months = {}
+        if transactions is not None and not transactions.empty:
+            first_dates = transactions.dropna(subset=["date"]).groupby("table")["date"].min()
+            table_months = first_dates.dt.strftime("%Y-%m").to_dict()
+        periods = []
+        for block in blocks:
+            label = block.split("\n", 1)[0].removeprefix("File: ").strip()
+            if PERIOD_LABEL.match(label):
+                periods.append(label)
+                continue
+            months = [table_months[int(i)] for i in re.findall(r"table(\d+)\.md", label) if int(i) in table_months]
+            periods.append(min(months) if months else None)
+        return periods
+
+    @traced("reduce_summaries")
+    def reduce_summaries(self, summary_text, budget, transactions=None, max_levels=8):
+        """Tree-reduce the result file's summaries until they fit in budget tokens.
+
+        Summaries are ordered chronologically and each month's are packed
+        into condense calls as large as the summary model's context allows,
+        so the fan-in follows the token budget; months with a single summary
+        pass through the first level untouched. Later levels merge
+        consecutive periods the same way. Each level's calls run in parallel and shrink the input by
+        about the fan-in, so latency grows with the log of statement length.
+        """
+        if estimate_tokens(summary_text) <= budget:
+            return summary_text
+
+        blocks = split_summaries(summary_text)
+        periods = [period or "undated" for period in self.summary_periods(blocks, transactions)]
+        # Undated blocks (markdown-only tables) sort after every dated month
+        items = sorted(zip(periods, blocks), key=lambda item: (item[0] == "undated", item[0]))
+
+        condense_budget = self.chunk_tokens or token_budget(self.summary_llm.num_ctx, CONDENSE_PROMPT)
+        total = sum(estimate_tokens(text) for _, text in items)
+        for level in range(1, max_levels + 1):
+            if total <= budget:
+                break
+            if level == 1:
+                # The first level condenses each month on its own; a month with a single block is already one
+                # summary, so it passes through instead of spending a call that barely shrinks it
+                plan = []
+                for _, group in groupby(items, key=lambda item: item[0]):
+                    group = list(group)
+                    plan.extend(group if len(group) == 1 else pack_tables(group, condense_budget, kind="Period"))
+            else:
+                # Later levels merge consecutive periods
+                plan = pack_tables(items, condense_budget, kind="Period")
+            chunks = [entry for entry in plan if isinstance(entry, dict)]
+            if not chunks:
+                continue
+            with tracer.span("reduce_level", level=level, items=len(items), calls=len(chunks),
+                             fan_in=round(sum(len(chunk["labels"]) for chunk in chunks) / len(chunks), 2)):
+                responses = iter(self.invoke_many(self.summary_llm, CONDENSE_PROMPT, [chunk["text"] for chunk in chunks]))
+            condensed = [(period_range(entry["labels"]), render_summary(next(responses))) if isinstance(entry, dict)
+                         else entry for entry in plan]
+            condensed_total = sum(estimate_tokens(text) for _, text in condensed)
+            if condensed_total >= total:
+                # The model is not shrinking its input; stop rather than loop forever
+                break
+            items, total = condensed, condensed_total
+
+        return "".join(f"File: {period}\n{text}\n\n" for period, text in items)
+
+    @traced("final_summary")
+    def generate_final_summary(self, output_file, transactions=None):
         with open(output_file, "r", encoding="utf-8") as out_file:
             final_summary = out_file.read()
+
+        if transactions is not None and not transactions.empty:
+            return self.generate_fact_sheet_summary(final_summary, transactions)
         
         final_prompt = '''
 Imagine you are a bank statement analyzer. I have provided you with summaries of tables from a bank statement. Based on this information, I need you to give me an in-depth analysis of whether this person should receive a loan. Your analysis should include the following:
@@ -81,7 +366,32 @@ Imagine you are a bank statement analyzer. I have provided you with summaries of
     - Justify your recommendation with specific insights from the data.
 
 Here is the bank statement summary:
-\n\n''' + final_summary
-        return self.reasoning_llm.invoke(final_prompt)
+'''
+        final_summary = self.reduce_summaries(final_summary, token_budget(self.reasoning_llm.num_ctx, final_prompt))
+        return self.invoke(self.reasoning_llm, final_prompt, final_summary)
     
     
+
+    def generate_fact_sheet_summary(self, final_summary, transactions):
+        # The figures are computed from the transaction frame, so the model only has to interpret them
+        facts = format_fact_sheet(compute_metrics(transactions))
+        # Red flags are detected over the whole statement at once instead of left to each table's summary
+        with tracer.span("anomaly_detection", transactions=len(transactions)) as span:
+            anomalies = detect_anomalies(transactions)
+            span["attributes"]["flags"] = len(anomalies)
+        self.red_flags = format_anomalies(anomalies)
+        facts = f"{facts}\n{self.red_flags}"
+        final_prompt = '''
+Imagine you are a bank statement analyzer deciding whether this person should receive a loan. The fact sheet below was computed exactly from every transaction, including the red flags detected in it; use its figures as given and do not recalculate them. The table summaries add context on individual transactions.
+
+Cover, briefly and with figures from the fact sheet:
+1. **Income Stability**: consistency of monthly income (a coefficient of variation above 0.3 is irregular).
+2. **Debt-to-Income Ratio (DTI)**: interpret the given DTI (< 20% excellent, 20-35% manageable, > 35% risky).
+3. **Spending Habits**: recurring expenses, discretionary spending, signs of overspending.
+4. **Overall Financial Health**: overdrafts, fees, negative balances, the red flags listed, ability to save.
+5. **Conclusion**: a clear Yes or No recommendation, justified by specific facts.
+'''
+        # Long statements are condensed period by period so the summaries still fit the reasoning model's context
+        budget = token_budget(self.reasoning_llm.num_ctx, final_prompt + facts)
+        final_summary = self.reduce_summaries(final_summary, budget, transactions)
+        return self.invoke(self.reasoning_llm, final_prompt, f"Fact sheet:\n{facts}\n\nTable summaries:\n{final_summary}")
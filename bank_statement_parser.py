@@ -1,56 +1,142 @@
+from collections import deque
 from llama_parse import LlamaParse
+from result_cache import hash_file, make_key
+from transactions import TRANSACTIONS_FILE, TransactionWriter, build_transaction_frame, extract_tables_from_markdown
+from local_extractor import extract_page, iter_local, page_count
+from tracing import tracer
 import os
 
+# Low-confidence pages are sent to LlamaParse in batches of this many
+LLAMAPARSE_BATCH = 8
+# Pages held back in order while waiting for a LlamaParse batch to fill
+PAGE_BUFFER = 32
+# Locally extracted pages scoring below this go to LlamaParse
+MIN_CONFIDENCE = 0.6
 
 
 class BankStatementParser:
-    def __init__(self, api_key, result_type="markdown", premium_mode=False):
+    def __init__(self, api_key, result_type="markdown", premium_mode=False, cache=None, local_first=True, min_confidence=MIN_CONFIDENCE):
         self.parser = LlamaParse(result_type=result_type, 
                                 api_key=api_key, 
                                 premium_mode=premium_mode)
+        self.result_type = result_type
+        self.premium_mode = premium_mode
+        self.cache = cache
+        # Text-based PDFs are extracted locally; only pages below min_confidence go to LlamaParse
+        self.local_first = local_first
+        self.min_confidence = min_confidence
+        self.llamaparse_pages = []
     
     
     
     def extract_tables_from_markdown(self, markdown_content):
-        tables = []
-        lines = markdown_content.split('\n')
-        table = []
-        in_table = False
-
-        for line in lines:
-            if line.strip().startswith('|') and line.strip().endswith('|'):
-                if not in_table:
-                    in_table = True
-                table.append(line)
+        return extract_tables_from_markdown(markdown_content)
+    
+    def load_tables(self, file):
+        return [table for _, tables in self.iter_pages(file) for table in tables]
+
+    def iter_pages(self, file):
+        """Yield (page_number, tables) in page order, one page at a time.
+
+        Each page's tables are cached on their own, so re-uploading a statement
+        skips every page already seen. Only a bounded number of pages is held
+        back while consecutive low-confidence pages are batched for LlamaParse.
+        """
+        if not self.local_first:
+            if self.cache is None:
+                pages = self.load_tables_llamaparse(file)
             else:
-                if in_table:
-                    tables.append('\n'.join(table))
-                    table = []
-                    in_table = False
+                key = make_key("parse", hash_file(file), self.result_type, self.premium_mode, False)
+                pages = self.cache.get_or_compute(key, lambda: self.load_tables_llamaparse(file))
+            yield from enumerate(pages)
+            return
 
-        if in_table:
-            tables.append('\n'.join(table))
+        file_hash = hash_file(file) if self.cache is not None else None
 
-        return tables
-    
-    def parse_statement(self, file, output_dir):
-        documents = self.parser.load_data(file)
-        tables = []
-        for doc in documents:
-            markdown_content = doc.text
-            tables_extract = self.extract_tables_from_markdown(markdown_content)
-            for table in tables_extract:
-                tables.append(table)
+        def page_key(page_number):
+            return make_key("parse_page", file_hash, page_number, self.result_type, self.premium_mode, self.min_confidence)
+
+        page_numbers = range(page_count(file))
+        missing = [page for page in page_numbers if self.cache is None or page_key(page) not in self.cache]
+        extracted = iter_local(file, missing)
+        self.llamaparse_pages = []
+        pending = deque()
+        low_confidence = []
+
+        def flush():
+            if low_confidence:
+                parsed = self.load_pages_llamaparse(file, low_confidence)
+                for page_number in low_confidence:
+                    if self.cache is not None:
+                        self.cache.set(page_key(page_number), parsed[page_number])
+                for i, (page_number, tables) in enumerate(pending):
+                    if tables is None:
+                        pending[i] = (page_number, parsed.get(page_number, []))
+                low_confidence.clear()
+            while pending:
+                yield pending.popleft()
 
+        missing = set(missing)
+        for page_number in page_numbers:
+            tables = None if page_number in missing else self.cache.get(page_key(page_number))
+            if tables is not None:
+                pending.append((page_number, tables))
+            else:
+                with tracer.span("local_extraction", page=page_number) as span:
+                    # A cached page evicted since the check above is simply extracted again
+                    page = next(extracted) if page_number in missing else extract_page(file, page_number)
+                    span["attributes"]["confidence"] = round(page["confidence"], 3)
+                if page["confidence"] < self.min_confidence:
+                    self.llamaparse_pages.append(page_number)
+                    low_confidence.append(page_number)
+                    pending.append((page_number, None))
+                else:
+                    if self.cache is not None:
+                        self.cache.set(page_key(page_number), page["tables"])
+                    pending.append((page_number, page["tables"]))
+            if not low_confidence or len(low_confidence) >= LLAMAPARSE_BATCH or len(pending) >= PAGE_BUFFER:
+                yield from flush()
+        yield from flush()
+
+    def load_tables_llamaparse(self, file):
+        """Tables of every page of the file, as one list per LlamaParse document."""
+        with tracer.span("llamaparse"):
+            documents = self.parser.load_data(file)
+        return [self.extract_tables_from_markdown(doc.text) for doc in documents]
+
+    def load_pages_llamaparse(self, file, page_numbers):
+        # LlamaParse returns one document per requested page, in the order requested
+        parser = self.parser.model_copy(update={"target_pages": ",".join(str(page) for page in page_numbers)})
+        with tracer.span("llamaparse", pages=len(page_numbers)):
+            documents = parser.load_data(file)
+        return {page: self.extract_tables_from_markdown(doc.text) for page, doc in zip(page_numbers, documents)}
+
+    def iter_statement(self, file, output_dir):
+        """Parse page by page, writing each table and its typed rows to output_dir as soon as its page is done.
+
+        Yields (label, markdown, rows) for every table, where rows is the
+        table's typed transaction frame or None if it holds no transactions.
+        """
         os.makedirs(output_dir, exist_ok=True)
-        
-        # Print the extracted tables
-        for i, table in enumerate(tables):
-            file_path = os.path.join(output_dir, f"table{i}.md")
-            with open(file_path, "w", encoding="utf-8") as file:
-                file.write(table)
-        
-        return tables
-                
-        
-        
\ No newline at end of file
+        index = 0
+        with TransactionWriter(os.path.join(output_dir, TRANSACTIONS_FILE)) as writer:
+            for _, tables in self.iter_pages(file):
+                # Parse the tables into typed transactions once so downstream stages never re-split markdown
+                with tracer.span("table_extraction", tables=len(tables)) as span:
+                    frame = build_transaction_frame(tables, index)
+                    writer.append(frame)
+                    span["attributes"].update(transactions=len(frame), unparsed_rows=frame.attrs["unparsed_rows"])
+                by_table = dict(iter(frame.groupby("table")))
+                for table in tables:
+                    label = f"table{index}.md"
+                    with open(os.path.join(output_dir, label), "w", encoding="utf-8") as out_file:
+                        out_file.write(table)
+                    yield label, table, by_table.get(index)
+                    index += 1
+
+    def parse_statement(self, file, output_dir):
+        """Parse a statement into output_dir and return the paths of its table files."""
+        with tracer.span("parse_statement") as span:
+            paths = [os.path.join(output_dir, label) for label, _, _ in self.iter_statement(file, output_dir)]
+            span["attributes"]["tables"] = len(paths)
+        return paths
@@ -0,0 +1,160 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from bank_statement_analyzer import BankStatementAnalyzer
+from bank_statement_parser import BankStatementParser
+from llm_client import LLMClient
+from metrics import compute_metrics
+from result_cache import ResultCache, hash_file
+from tracing import traced
+from transactions import TRANSACTIONS_FILE, load_transactions
+
+
+def load_completed(output_path):
+    """Return the hashes of statements already written successfully to the output file."""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("status") == "ok":
+                completed.add(record["sha256"])
+    return completed
+
+
+class BatchRunner:
+    def __init__(self, api_key, work_dir="runs", parse_concurrency=4, llm_concurrency=2,
+                 summary_model="gemma2:9b", reasoning_model="phi4", cache=None, keep_workdirs=False):
+        self.api_key = api_key
+        self.work_dir = work_dir
+        self.summary_model = summary_model
+        self.reasoning_model = reasoning_model
+        self.cache = cache
+        self.keep_workdirs = keep_workdirs
+        self.parse_concurrency = parse_concurrency
+        self.llm_concurrency = llm_concurrency
+        self.parse_limit = threading.Semaphore(parse_concurrency)
+        self.client = LLMClient(max_in_flight=llm_concurrency)
+        self._write_lock = threading.Lock()
+
+    @traced("statement")
+    def process_statement(self, pdf_path, sha256):
+        name = os.path.splitext(os.path.basename(pdf_path))[0]
+        statement_dir = os.path.join(self.work_dir, f"{name}-{sha256[:12]}")
+        tables_dir = os.path.join(statement_dir, "tables")
+        shutil.rmtree(statement_dir, ignore_errors=True)
+        start = time.time()
+
+        with self.parse_limit:
+            parser = BankStatementParser(api_key=self.api_key, cache=self.cache)
+            tables = parser.parse_statement(pdf_path, tables_dir)
+
+        analyzer = BankStatementAnalyzer(self.summary_model, self.reasoning_model,
+                                         cache=self.cache, client=self.client)
+        output_file = analyzer.analyze_tables(tables_dir, os.path.join(statement_dir, "result.txt"))
+        with open(output_file, "r", encoding="utf-8") as out_file:
+            summaries = out_file.read()
+        transactions = load_transactions(os.path.join(tables_dir, TRANSACTIONS_FILE))
+        decision = analyzer.generate_final_summary(output_file, transactions)
+
+        if not self.keep_workdirs:
+            shutil.rmtree(statement_dir, ignore_errors=True)
+
+        return {
+            "file": pdf_path,
+            "sha256": sha256,
+            "status": "ok",
+            "tables": len(tables),
+            "chunks": analyzer.chunk_stats,
+            "summaries": summaries,
+            "metrics": compute_metrics(transactions),
+            "decision": decision,
+            "elapsed": round(time.time() - start, 3),
+        }
+
+    def write_record(self, output_path, record):
+        with self._write_lock:
+            with open(output_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record) + "\n")
+                file.flush()
+
+    def run(self, pdf_paths, output_path):
+        completed = load_completed(output_path)
+        pending = []
+        for pdf_path in pdf_paths:
+            sha256 = hash_file(pdf_path)
+            if sha256 in completed:
+                print(f"Skipping {pdf_path} (already processed)")
+                continue
+            completed.add(sha256)
+            pending.append((pdf_path, sha256))
+
+        os.makedirs(self.work_dir, exist_ok=True)
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        # Statements wait on the parse semaphore and the LLM client, so run enough of them to keep both busy
+        workers = self.parse_concurrency + self.llm_concurrency
+        failures = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.process_statement, pdf_path, sha256): (pdf_path, sha256)
+                       for pdf_path, sha256 in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                pdf_path, sha256 = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:
+                    failures += 1
+                    record = {"file": pdf_path, "sha256": sha256, "status": "error", "error": str(e)}
+                self.write_record(output_path, record)
+                print(f"[{done}/{len(pending)}] {record['status']}: {pdf_path}")
+
+        return len(pending) - failures, failures
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Analyze a directory of bank statements without the Streamlit UI.")
+    arg_parser.add_argument("inputs", nargs="*", default=["statements/*.pdf"],
+                            help="PDF files, directories or glob patterns (default: statements/*.pdf)")
+    arg_parser.add_argument("-o", "--output", default="batch_results.jsonl", help="JSON-lines output file")
+    arg_parser.add_argument("--work-dir", default="runs", help="Parent directory for per-statement working dirs")
+    arg_parser.add_argument("--parse-concurrency", type=int, default=4, help="Max concurrent LlamaParse calls")
+    arg_parser.add_argument("--llm-concurrency", type=int, default=2, help="Max concurrent Ollama calls")
+    arg_parser.add_argument("--summary-model", default="gemma2:9b")
+    arg_parser.add_argument("--reasoning-model", default="phi4")
+    arg_parser.add_argument("--api-key", default=os.environ.get("LLAMA_CLOUD_API_KEY", "input-your-key"))
+    arg_parser.add_argument("--cache-dir", default="cache", help="Result cache directory ('' to disable)")
+    arg_parser.add_argument("--keep-workdirs", action="store_true", help="Keep per-statement working dirs")
+    args = arg_parser.parse_args(argv)
+
+    pdf_paths = []
+    for pattern in args.inputs:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*.pdf")
+        pdf_paths.extend(sorted(glob.glob(pattern)))
+
+    cache = ResultCache(args.cache_dir) if args.cache_dir else None
+    runner = BatchRunner(args.api_key, work_dir=args.work_dir,
+                         parse_concurrency=args.parse_concurrency, llm_concurrency=args.llm_concurrency,
+                         summary_model=args.summary_model, reasoning_model=args.reasoning_model,
+                         cache=cache, keep_workdirs=args.keep_workdirs)
+    succeeded, failed = runner.run(pdf_paths, args.output)
+    print(f"\nProcessed {succeeded} statements, {failed} failed. Results in {args.output}")
+    if cache is not None:
+        print(f"Cache: {cache.stats()}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
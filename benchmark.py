@@ -0,0 +1,203 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from bank_statement_analyzer import BankStatementAnalyzer
+from bank_statement_parser import BankStatementParser
+from categorizer import TransactionCategorizer
+from chat_index import CHAT_PROMPT
+from generate_data import LAYOUTS, generate_pdf, generate_transactions, transaction_frame
+from llm_client import LLMClient
+from metrics import compute_metrics, format_fact_sheet
+from model_router import ModelRouter
+from prompts import Conversation
+from stub_ollama import StubOllamaServer
+from tracing import tracer
+from transactions import TRANSACTIONS_FILE, build_transaction_frame, frame_to_prompt, save_transactions
+
+STAGES = ["generate", "parse", "extract", "categorize", "analyze", "chat"]
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+
+
+def measure(name, func, *args):
+    """Run one stage, returning its result with wall time, Python peak memory and LLM call latencies.
+
+    Peak memory covers allocations in this process only; local extraction
+    workers run in child processes and are not included.
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        with tracer.span(f"benchmark_{name}") as span:
+            started = time.perf_counter()
+            result = func(*args)
+            seconds = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    llm_spans = [child for child in tracer.trace(span["trace_id"]) if child["name"] in ("llm_call", "llm_stream")]
+    return result, {"stage": name, "seconds": seconds, "peak_mb": peak / 2**20,
+                    "llm_seconds": [child["duration"] for child in llm_spans],
+                    "llm_input_tokens": sum(child["attributes"].get("input_tokens") or 0 for child in llm_spans),
+                    "llm_prefix_tokens": sum(child["attributes"].get("prefix_tokens") or 0 for child in llm_spans),
+                    "llm_small_calls": sum(1 for child in llm_spans if child["attributes"].get("tier") == "small"),
+                    "llm_escalations": sum(1 for child in tracer.trace(span["trace_id"]) if child["name"] == "llm_escalation")}
+
+
+def run_once(size, work_dir, router, layout="grid", tables_per_page=1, months=12, seed=0, chat_turns=5):
+    """Push one synthetic statement of size transactions through every stage."""
+    shutil.rmtree(work_dir, ignore_errors=True)
+    tables_dir = os.path.join(work_dir, "tables")
+    os.makedirs(tables_dir)
+    pdf_path = os.path.join(work_dir, "statement.pdf")
+    samples = []
+
+    def generate():
+        df = transaction_frame(generate_transactions(size, months, seed=seed))
+        generate_pdf(df, pdf_path, layout, tables_per_page=tables_per_page)
+        return df
+
+    def extract(tables):
+        for i, table in enumerate(tables):
+            with open(os.path.join(tables_dir, f"table{i}.md"), "w", encoding="utf-8") as file:
+                file.write(table)
+        frame = build_transaction_frame(tables)
+        save_transactions(frame, os.path.join(tables_dir, TRANSACTIONS_FILE))
+        return frame
+
+    def analyze(frame):
+        analyzer = BankStatementAnalyzer(router=router)
+        output_file = analyzer.analyze_tables(tables_dir, os.path.join(work_dir, "result.txt"))
+        return analyzer.generate_final_summary(output_file, frame)
+
+    def chat(frame):
+        # A multi-turn session where each question brings a different slice of rows, as retrieval would
+        conversation = Conversation(CHAT_PROMPT, f"Fact sheet:\n{format_fact_sheet(compute_metrics(frame))}")
+        client = router.clients[0]
+        llm = client.get_model("gemma2:9b", num_ctx=8192)
+        latencies = []
+        for turn in range(chat_turns):
+            question = f"What stands out in rows {turn * 25} to {turn * 25 + 24}?"
+            evidence = frame_to_prompt(frame.iloc[turn * 25:turn * 25 + 25])
+            started = time.perf_counter()
+            answer = "".join(client.stream(llm, conversation.prompt(question, evidence)))
+            latencies.append(time.perf_counter() - started)
+            conversation.record(question, evidence, answer)
+        return latencies
+
+    # Everything below the confidence floor would go to LlamaParse, which needs the network
+    parser = BankStatementParser(api_key="benchmark", min_confidence=0.0)
+    categorizer = TransactionCategorizer(cache_path=None, router=router)
+
+    generated, sample = measure("generate", generate)
+    samples.append(sample)
+    tables, sample = measure("parse", parser.load_tables, pdf_path)
+    samples.append(sample)
+    frame, sample = measure("extract", extract, tables)
+    samples.append(sample)
+    if len(frame) != len(generated):
+        # Throughput for a layout that loses rows would be meaningless
+        raise RuntimeError(f"Extracted {len(frame)} of {len(generated)} rows from the {layout} layout")
+    _, sample = measure("categorize", categorizer.categorize, frame)
+    samples.append(sample)
+    _, sample = measure("analyze", analyze, frame)
+    samples.append(sample)
+    if chat_turns:
+        _, sample = measure("chat", chat, frame)
+        samples.append(sample)
+
+    for sample in samples:
+        sample.update(size=size, rows=len(generated), extracted_rows=len(frame))
+    return samples
+
+
+def summarize(samples):
+    """Per size and stage: p50/p95 wall time, throughput, peak memory and LLM call percentiles."""
+    rows = []
+    frame = pd.DataFrame(samples)
+    for (size, stage), group in frame.groupby(["size", "stage"], sort=False):
+        seconds = group["seconds"].to_numpy()
+        llm_seconds = [value for values in group["llm_seconds"] for value in values]
+        rows.append({
+            "size": size,
+            "stage": stage,
+            "runs": len(group),
+            "p50_s": np.percentile(seconds, 50),
+            "p95_s": np.percentile(seconds, 95),
+            "rows_per_s": group["rows"].iloc[0] / np.percentile(seconds, 50),
+            "peak_mb": group["peak_mb"].max(),
+            "llm_calls": len(llm_seconds) / len(group),
+            "llm_p50_s": np.percentile(llm_seconds, 50) if llm_seconds else None,
+            "llm_p95_s": np.percentile(llm_seconds, 95) if llm_seconds else None,
+            # Estimated share of prompt tokens an Ollama slot already held, from the client's PrefixTracker
+            "prefix_hit_rate": group["llm_prefix_tokens"].sum() / group["llm_input_tokens"].sum()
+                               if group["llm_input_tokens"].sum() else None,
+            "escalation_rate": group["llm_escalations"].sum() / group["llm_small_calls"].sum()
+                               if group["llm_small_calls"].sum() else None,
+            "extracted_rows": group["extracted_rows"].iloc[0],
+            "rows": group["rows"].iloc[0],
+        })
+    return pd.DataFrame(rows).round(4)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description="Benchmark the parse/extract/categorize/analyze stages on synthetic statements.")
+    arg_parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                            help="Comma-separated transaction counts")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--layout", choices=LAYOUTS, default="grid")
+    arg_parser.add_argument("--tables-per-page", type=int, default=1)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--ollama-url", default=None,
+                            help="Benchmark against real Ollama servers (comma-separated URLs) instead of the stub")
+    arg_parser.add_argument("--latency", type=float, default=0.05, help="Stub seconds before the first token")
+    arg_parser.add_argument("--token-delay", type=float, default=0.001, help="Stub seconds per generated token")
+    arg_parser.add_argument("--prompt-token-delay", type=float, default=0.0002,
+                            help="Stub seconds per prompt token not served from its prompt cache")
+    arg_parser.add_argument("--chat-turns", type=int, default=5, help="Turns in the multi-turn chat stage")
+    arg_parser.add_argument("--concurrency", type=int, default=4, help="LLM requests in flight")
+    arg_parser.add_argument("--output", default=None, help="Write the report to this .csv or .json file")
+    args = arg_parser.parse_args(argv)
+
+    # Keep benchmark spans out of the app's diagnostics file
+    tracer.path = None
+    server = None
+    if args.ollama_url is None:
+        server = StubOllamaServer(latency=args.latency, token_delay=args.token_delay,
+                                  prompt_token_delay=args.prompt_token_delay, parallel=args.concurrency).start()
+    urls = args.ollama_url.split(",") if args.ollama_url else [server.url]
+    router = ModelRouter([LLMClient(max_in_flight=args.concurrency, base_url=url) for url in urls])
+
+    work_dir = tempfile.mkdtemp(prefix="benchmark-")
+    samples = []
+    try:
+        for size in [int(size) for size in args.sizes.split(",")]:
+            for run in range(args.repeat):
+                samples.extend(run_once(size, work_dir, router, args.layout, args.tables_per_page, seed=args.seed + run,
+                                        chat_turns=args.chat_turns))
+                print(f"size={size} run={run + 1}/{args.repeat} done", flush=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if server is not None:
+            server.shutdown()
+
+    report = summarize(samples)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(report.to_string(index=False))
+    if args.output:
+        if args.output.endswith(".json"):
+            report.to_json(args.output, orient="records", indent=2)
+        else:
+            report.to_csv(args.output, index=False)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import json
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from model_router import ModelRouter, Route, shared_router, small_model
+from metrics import normalize_description
+from prompts import assemble
+from tracing import tracer
+
+CATEGORIES = [
+    "Groceries", "Transportation", "Fees", "Rent", "Car", "Utilities", "Entertainment", "Food/Drink",
+    "Health", "Shopping", "Deposits", "Debt Payments", "Insurance", "Travel", "Transfers", "Other",
+]
+
+# Normalized keyword -> category; matched on word boundaries, longest keyword first
+DEFAULT_RULES = {
+    "Groceries": ["groceries", "grocery", "supermarket", "tesco", "sainsbury", "asda", "aldi", "lidl", "morrisons",
+                  "waitrose", "whole foods", "kroger", "safeway", "walmart", "costco", "trader joe", "coles", "woolworths"],
+    "Transportation": ["uber", "lyft", "taxi", "metro", "tfl", "transit", "bus", "train", "rail", "oyster", "parking"],
+    "Car": ["fuel", "petrol", "gas station", "shell", "bp", "exxon", "chevron", "car wash", "dvla", "auto repair"],
+    "Fees": ["fee", "charge", "overdraft", "nsf", "interest charged", "service charge", "atm fee"],
+    "Rent": ["rent", "landlord", "letting", "property management"],
+    "Utilities": ["utilities", "utility", "electric", "electricity", "water", "gas bill", "energy", "broadband",
+                  "internet", "phone bill", "vodafone", "verizon", "at&t", "comcast", "council tax", "recharge", "prepaid"],
+    "Entertainment": ["netflix", "spotify", "disney", "hulu", "cinema", "theatre", "steam", "playstation", "xbox"],
+    "Food/Drink": ["dining", "restaurant", "cafe", "coffee", "starbucks", "costa", "mcdonald", "kfc", "pizza",
+                   "deliveroo", "just eat", "doordash", "uber eats", "pub", "bar"],
+    "Health": ["pharmacy", "chemist", "boots", "cvs", "walgreens", "dentist", "doctor", "hospital", "clinic", "gym"],
+    "Shopping": ["shopping", "amazon", "ebay", "argos", "ikea", "target", "primark", "zara", "h&m", "apple store"],
+    "Deposits": ["salary", "payroll", "wages", "business revenue", "refund", "deposit", "interest paid", "dividend"],
+    # Not "card payment": UK banks prefix every debit-card purchase with it, which would hide the merchant
+    "Debt Payments": ["loan", "mortgage", "credit card", "amex", "american express", "barclaycard", "capital one", "mbna",
+                      "repayment", "finance", "klarna"],
+    "Insurance": ["insurance", "aviva", "geico", "allstate", "premium"],
+    "Travel": ["travel", "airline", "airways", "ryanair", "easyjet", "hotel", "airbnb", "booking com", "expedia"],
+    "Transfers": ["transfer", "fund trf", "imps", "neft", "rtgs", "upi", "zelle", "venmo", "paypal", "standing order"],
+}
+
+LLM_PROMPT = (
+    "Assign each bank transaction description below to exactly one of these categories: {categories}. "
+    "Respond with only a JSON object mapping every description, exactly as given, to its category."
+)
+
+
+def valid_categories(text):
+    """Whether a response is a JSON object with at least one usable category; ask_llm re-asks for the rest."""
+    try:
+        pairs = json.loads(text)
+    except ValueError:
+        return False
+    return isinstance(pairs, dict) and any(category in CATEGORIES for category in pairs.values())
+
+
+def category_schema(descriptions):
+    """JSON schema for one batch: every description, exactly as given, mapped to one known category."""
+    return {
+        "type": "object",
+        "properties": {description: {"type": "string", "enum": CATEGORIES} for description in descriptions},
+        "required": list(descriptions),
+    }
+
+
+def compile_rules(rules):
+    """Compile all keywords into one alternation so each description is scanned once."""
+    keyword_category = {}
+    for category, keywords in rules.items():
+        for keyword in keywords:
+            keyword_category[normalize_description([keyword])[0]] = category
+    keywords = sorted(keyword_category, key=len, reverse=True)
+    pattern = re.compile(r"\b(" + "|".join(re.escape(keyword) for keyword in keywords) + r")\b")
+    return pattern, keyword_category
+
+
+class TransactionCategorizer:
+    """Categorizes transactions by merchant rules, then a learned cache, then the LLM.
+
+    Descriptions the LLM resolves are written to a JSON cache keyed by
+    normalized description, so every later statement with the same payee is
+    categorized locally.
+    """
+
+    def __init__(self, rules=None, cache_path="category_cache.json", client=None,
+                 model="categorize_transactions_mistral", batch_size=60, router=None, fast_model=None, retries=2):
+        self.pattern, self.keyword_category = compile_rules(rules or DEFAULT_RULES)
+        self.cache_path = cache_path
+        self.router = router or (ModelRouter([client]) if client else shared_router())
+        # Batches go to the fast model first and are redone by model only when the answer is unusable; an answer
+        # that misses some descriptions is kept, and ask_llm re-asks just the missing ones
+        self.route = Route("categorize", model, fast_model or small_model(), num_ctx=8192, small_tokens=2000,
+                           validate=valid_categories, retries=0, enforce_schema=False)
+        self.batch_size = batch_size
+        # Rounds in which descriptions left out of (or mangled in) an answer are asked again on their own
+        self.retries = retries
+        self.last_stats = {}
+        self._lock = threading.Lock()
+        self.learned = {}
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as file:
+                self.learned = json.load(file)
+
+    def match_rules(self, descriptions):
+        keywords = descriptions.str.extract(self.pattern, expand=False)
+        return keywords.map(self.keyword_category)
+
+    def categorize(self, frame):
+        """Return a copy of the transaction frame with every row's category filled in."""
+        result = frame.copy()
+        descriptions = normalize_description(result["description"]).reset_index(drop=True)
+        categories = pd.Series(np.where(result["amount"].to_numpy() > 0, "Deposits", None), dtype="object")
+        resolved_by = pd.Series(np.where(categories.notna(), "direction", None), dtype="object")
+
+        def fill(candidates, source):
+            mask = categories.isna() & candidates.notna()
+            categories[mask] = candidates[mask]
+            resolved_by[mask] = source
+
+        fill(self.match_rules(descriptions), "rules")
+        with self._lock:
+            fill(descriptions.map(self.learned), "cache")
+
+        unknown = sorted(set(descriptions[categories.isna()]))
+        if unknown:
+            fill(descriptions.map(self.ask_llm(unknown)), "llm")
+        fill(pd.Series("Other", index=categories.index), "unresolved")
+
+        result["category"] = categories.to_numpy()
+        self.last_stats = resolved_by.value_counts().to_dict()
+        return result
+
+    def ask_llm(self, descriptions):
+        """Categorize unknown descriptions in batches and remember the answers.
+
+        Each batch asks for JSON matching its own schema. Descriptions an
+        answer still leaves out or miscategorizes are batched again and
+        re-asked on the large model, so one bad answer never costs a rerun of
+        the others.
+        """
+        prompt = LLM_PROMPT.format(categories=", ".join(CATEGORIES))
+        answers = {}
+        pending = list(descriptions)
+        with tracer.span("llm_categorization", descriptions=len(descriptions)) as span:
+            for attempt in range(self.retries + 1):
+                batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+                responses = self.router.invoke_many(self.route, [assemble(prompt, content="\n".join(batch)) for batch in batches],
+                                                    [category_schema(batch) for batch in batches],
+                                                    tier="large" if attempt else None)
+                for batch, response in zip(batches, responses):
+                    try:
+                        pairs = json.loads(response)
+                    except ValueError:
+                        continue
+                    if not isinstance(pairs, dict):
+                        continue
+                    for description in batch:
+                        category = pairs.get(description)
+                        if category in CATEGORIES:
+                            answers[description] = category
+                pending = [description for description in pending if description not in answers]
+                span["attributes"].update(rounds=attempt + 1, unanswered=len(pending))
+                if not pending:
+                    break
+        self.learn(answers)
+        return answers
+
+    def learn(self, answers):
+        if not answers:
+            return
+        with self._lock:
+            self.learned.update(answers)
+            if self.cache_path:
+                tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as file:
+                    json.dump(self.learned, file, indent=0, sort_keys=True)
+                os.replace(tmp_path, self.cache_path)
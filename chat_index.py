@@ -0,0 +1,180 @@
+import calendar
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+
+from metrics import normalize_description
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+STOPWORDS = {
+    "a", "an", "and", "are", "did", "do", "does", "for", "from", "how", "i", "in", "is", "it",
+    "many", "me", "much", "my", "of", "on", "or", "the", "to", "was", "were", "what", "when",
+    "which", "with", "you", "have", "has", "spend", "spent", "total", "there", "any", "at",
+    "by", "this", "that", "be", "been", "can", "could", "would", "should", "ever", "each", "per",
+}
+MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): number for number, name in enumerate(calendar.month_abbr) if name})
+
+CHAT_PROMPT = (
+    "You answer questions about one bank statement. Use the fact sheet and the relevant transactions "
+    "and summaries given with each question. If exact figures computed from the transaction data are "
+    "given, use them as is."
+)
+
+
+def tokenize(text):
+    return [token for token in _TOKEN.findall(str(text).lower()) if token not in STOPWORDS]
+
+
+def split_summaries(summary_text):
+    """Split the analyzer's result file into one document per 'File:' block."""
+    blocks = re.split(r"(?m)^(?=File: )", summary_text or "")
+    return [block.strip() for block in blocks if block.strip()]
+
+
+def transaction_documents(frame):
+    if frame is None or frame.empty:
+        return []
+    return (frame["date"].dt.strftime("%Y-%m-%d") + " | " + frame["description"].astype(str)
+            + " | " + frame["amount"].map("{:.2f}".format) + " | " + frame["direction"]).tolist()
+
+
+class ChatIndex:
+    """Hybrid retrieval over transaction rows and table summaries.
+
+    BM25 keyword scoring always runs; if an embedder with embed_documents /
+    embed_query (e.g. OllamaEmbeddings) is supplied, cosine similarity over a
+    normalized NumPy matrix is fused with BM25 by reciprocal rank.
+    """
+
+    def __init__(self, documents, embedder=None, k1=1.5, b=0.75):
+        self.documents = list(documents)
+        self.k1 = k1
+        self.b = b
+        tokenized = [tokenize(doc) for doc in self.documents]
+        self.lengths = np.array([len(tokens) for tokens in tokenized], dtype="float64")
+        self.avg_length = self.lengths.mean() if len(self.lengths) else 0.0
+
+        postings = defaultdict(lambda: ([], []))
+        for doc_id, tokens in enumerate(tokenized):
+            for term, count in Counter(tokens).items():
+                postings[term][0].append(doc_id)
+                postings[term][1].append(count)
+        n_docs = len(self.documents)
+        self.postings = {}
+        for term, (doc_ids, counts) in postings.items():
+            idf = np.log(1 + (n_docs - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            self.postings[term] = (np.array(doc_ids), np.array(counts, dtype="float64"), idf)
+
+        self.embedder = embedder
+        self.embeddings = None
+        if embedder is not None and self.documents:
+            try:
+                matrix = np.asarray(embedder.embed_documents(self.documents), dtype="float32")
+                self.embeddings = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            except Exception as e:
+                print(f"Embedding index unavailable, using keyword search only: {e}")
+
+    def bm25_scores(self, query):
+        scores = np.zeros(len(self.documents))
+        for term in tokenize(query):
+            if term not in self.postings:
+                continue
+            doc_ids, counts, idf = self.postings[term]
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_ids] / self.avg_length)
+            scores[doc_ids] += idf * counts * (self.k1 + 1) / (counts + norm)
+        return scores
+
+    def cosine_scores(self, query):
+        vector = np.asarray(self.embedder.embed_query(query), dtype="float32")
+        return self.embeddings @ (vector / max(np.linalg.norm(vector), 1e-12))
+
+    def search(self, query, k=20):
+        if not self.documents:
+            return []
+        rankings = [self.bm25_scores(query)]
+        if self.embeddings is not None:
+            try:
+                rankings.append(self.cosine_scores(query))
+            except Exception as e:
+                print(f"Embedding query failed, using keyword search only: {e}")
+
+        fused = np.zeros(len(self.documents))
+        for scores in rankings:
+            order = np.argsort(-scores)
+            ranks = np.empty(len(order))
+            ranks[order] = np.arange(1, len(order) + 1)
+            fused += np.where(scores > 0, 1.0 / (60 + ranks), 0.0)
+        top = np.argsort(-fused)[:k]
+        return [self.documents[i] for i in top if fused[i] > 0]
+
+
+def _date_filter(question, dates):
+    """Return (mask, label) for a date range or month named in the question, or None."""
+    text = question.lower()
+    found = re.findall(r"\d{4}-\d{2}(?:-\d{2})?", text)
+    if found:
+        start = pd.Timestamp(found[0])
+        last = found[-1]
+        end = pd.Timestamp(last) + pd.offsets.MonthEnd(0) if len(last) == 7 else pd.Timestamp(last)
+        return (dates >= start) & (dates <= end), f"{start:%Y-%m-%d} to {end:%Y-%m-%d}"
+
+    year = re.search(r"\b(?:19|20)\d{2}\b", text)
+    for match in re.finditer(r"[a-z]+", text):
+        word = match.group(0)
+        # "may" is usually a verb unless it sits next to a year or follows "in"
+        if word not in MONTHS or (word == "may" and not re.search(r"\bin may\b|\bmay (?:19|20)\d{2}\b", text)):
+            continue
+        mask = dates.dt.month == MONTHS[word]
+        label = calendar.month_name[MONTHS[word]]
+        if year:
+            mask &= dates.dt.year == int(year.group(0))
+            label += f" {year.group(0)}"
+        return mask, label
+    return None
+
+
+def answer_numeric(question, frame):
+    """Answer totals/counts questions directly from the transaction frame.
+
+    Returns a short factual sentence, or None when the question is not numeric
+    or nothing matches.
+    """
+    text = question.lower()
+    wants_total = re.search(r"\b(total|how much|sum|spent|spend|paid|earn|earned|income)\b", text)
+    wants_count = re.search(r"\b(how many|count|number of|times)\b", text)
+    if frame is None or frame.empty or not (wants_total or wants_count):
+        return None
+
+    rows = frame
+    period = "the whole statement"
+    date_filter = _date_filter(question, rows["date"])
+    if date_filter is not None:
+        mask, period = date_filter
+        rows = rows[mask]
+
+    descriptions = normalize_description(rows["description"])
+    terms = [term for term in tokenize(question) if not term.isdigit() and term not in MONTHS]
+    term_masks = {term: descriptions.str.contains(rf"\b{re.escape(term)}", regex=True).to_numpy() for term in terms}
+    matched_terms = [term for term, mask in term_masks.items() if mask.any()]
+    label = "all transactions"
+    if matched_terms:
+        rows = rows[np.logical_or.reduce([term_masks[term] for term in matched_terms])]
+        label = "transactions matching " + ", ".join(f"'{term}'" for term in matched_terms)
+
+    if re.search(r"\b(income|earn|earned|deposit|deposits|received)\b", text):
+        rows = rows[rows["amount"] > 0]
+        direction = "credits"
+    elif re.search(r"\b(spent|spend|paid|expense|expenses|cost)\b", text) or matched_terms:
+        rows = rows[rows["amount"] < 0]
+        direction = "debits"
+    else:
+        direction = "transactions"
+
+    if rows.empty:
+        return f"Computed from transaction data: no {direction} found for {label} in {period}."
+    total = rows["amount"].abs().sum()
+    return (f"Computed from transaction data: {len(rows)} {direction} for {label} in {period}, "
+            f"totalling {total:,.2f} (from {rows['date'].min():%Y-%m-%d} to {rows['date'].max():%Y-%m-%d}).")
@@ -0,0 +1,78 @@
+import math
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Rough token count; tokenizers for the local models average about four characters per token."""
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def token_budget(num_ctx, prompt, response_reserve=1024):
+    """Tokens left for table content once the instruction prompt and the response are accounted for."""
+    return max(256, num_ctx - estimate_tokens(prompt) - response_reserve)
+
+
+def _header_size(lines):
+    # Markdown tables carry a |---| separator under the header; CSV has a single header line
+    if len(lines) > 1 and set(lines[1].replace('|', '').strip()) <= set('-: '):
+        return 2
+    return 1
+
+
+def split_table(text, budget):
+    """Split a table on row boundaries so every part fits the budget, repeating the header in each part."""
+    if estimate_tokens(text) <= budget:
+        return [text]
+
+    lines = text.strip().split('\n')
+    header = lines[:_header_size(lines)]
+    header_tokens = estimate_tokens('\n'.join(header))
+    parts = []
+    rows = []
+    rows_tokens = 0
+    for row in lines[len(header):]:
+        row_tokens = estimate_tokens(row + '\n')
+        if rows and header_tokens + rows_tokens + row_tokens > budget:
+            parts.append('\n'.join(header + rows))
+            rows = []
+            rows_tokens = 0
+        rows.append(row)
+        rows_tokens += row_tokens
+    if rows:
+        parts.append('\n'.join(header + rows))
+    return parts
+
+
+def iter_chunks(tables, budget, kind="Table"):
+    """Turn (label, content) tables into as few prompt-sized chunks as possible.
+
+    Oversized tables are split first, then consecutive pieces are packed
+    together until the next one would overflow the budget. Each chunk is a
+    dict with the labels it covers, its text and its estimated token count.
+    kind names what each piece is in its heading line ("Table", "Period").
+    Tables are consumed lazily and each chunk is yielded as soon as it is
+    full, so only one chunk is ever held in memory.
+    """
+    current = None
+    for label, content in tables:
+        # Leave room for the "<kind>: <label> (part i/n)" line added to each piece
+        parts = split_table(content, budget - estimate_tokens(f"{kind}: {label} (part 00/00)\n"))
+        for i, part in enumerate(parts, 1):
+            part_label = label if len(parts) == 1 else f"{label} (part {i}/{len(parts)})"
+            text = f"{kind}: {part_label}\n{part}"
+            tokens = estimate_tokens(text)
+            if current is not None and current["tokens"] + tokens <= budget:
+                current["labels"].append(part_label)
+                current["text"] += f"\n\n{text}"
+                current["tokens"] += tokens
+                continue
+            if current is not None:
+                yield current
+            current = {"labels": [part_label], "text": text, "tokens": tokens}
+    if current is not None:
+        yield current
+
+
+def pack_tables(tables, budget, kind="Table"):
+    return list(iter_chunks(tables, budget, kind))
@@ -0,0 +1,56 @@
+import io
+import math
+
+import matplotlib.pyplot as plt
+import streamlit as st
+
+from transactions import load_transactions, parse_markdown_table
+
+PAGE_SIZE = 100
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def load_statement(transactions_path, content_hash):
+    """A statement's transactions, read from disk once per content hash and shared by every page."""
+    return load_transactions(transactions_path)
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def load_table(table_path, transactions_path, content_hash, index):
+    """One extracted table: its typed rows if it held transactions, otherwise the parsed markdown."""
+    rows = load_transactions(transactions_path, tables=[index])
+    if not rows.empty:
+        return rows.drop(columns="table")
+    with open(table_path, "r", encoding="utf-8") as file:
+        return parse_markdown_table(file.read())
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def render_pie(categories, amounts):
+    """PNG of the expense breakdown, keyed on the aggregates so revisiting a page skips matplotlib."""
+    fig, ax = plt.subplots(figsize=(6, 6))
+    wedges, texts, autotexts = ax.pie(
+        amounts, labels=categories, autopct='%1.1f%%', startangle=140,
+        textprops={'fontsize': 12, 'weight': 'bold'}, wedgeprops={'edgecolor': 'black'}
+    )
+    ax.set_title("Expense Breakdown", fontsize=16, fontweight="bold")
+
+    for text in texts:
+        text.set_color("#333")
+    for autotext in autotexts:
+        autotext.set_color("darkred")
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def paginated_dataframe(frame, key, page_size=PAGE_SIZE):
+    """Show a large frame one page at a time so only page_size rows are sent to the browser per rerun."""
+    pages = max(1, math.ceil(len(frame) / page_size))
+    page = st.number_input(f"Page (of {pages})", 1, pages, 1, key=f"{key}_page") if pages > 1 else 1
+    start = (page - 1) * page_size
+    st.dataframe(frame.iloc[start:start + page_size], hide_index=True, use_container_width=True)
+    if pages > 1:
+        st.caption(f"Rows {start + 1}-{min(start + page_size, len(frame))} of {len(frame)}")
@@ -1,13 +1,13 @@
+import argparse
+import math
 import os
 import pandas as pd
 import random
-from faker import Faker
 from datetime import datetime, timedelta
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
-
-fake = Faker()
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, PageBreak, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet
 
 categories = {
     "Deposits": ["Salary", "Business Revenue", "Refund"],
@@ -16,54 +16,89 @@ categories = {
     "Debt Payments": ["Credit Card Payment", "Other Loan"]
 }
 
-output_folder = "synthetic_statements"
-os.makedirs(output_folder, exist_ok=True)
+LAYOUTS = ["grid", "plain", "split"]
+ROWS_PER_PAGE = 30
+
+
+def add_months(date, months):
+    month = date.month - 1 + months
+    return date.replace(year=date.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def generate_transactions(num_transactions=100, months=12, start_date="2023-01-01", seed=None, rng=None):
+    """Generate recurring monthly salary/rent/loan rows plus num_transactions random ones.
 
-def generate_transactions(num_transactions=100, start_date="2023-01-01", end_date="2023-12-31"):
+    The same seed always produces the same statement.
+    """
+    rng = rng or random.Random(seed)
     transactions = []
     start = datetime.strptime(start_date, "%Y-%m-%d")
-    end = datetime.strptime(end_date, "%Y-%m-%d")
+    end = add_months(start, months) - timedelta(days=1)
 
-    for month in range(1, 13):
-        salary_date = datetime(2023, month, 1) + timedelta(days=random.randint(0, 5))
-        rent_date = datetime(2023, month, 5) + timedelta(days=random.randint(0, 3))
-        loan_date = datetime(2023, month, 15) + timedelta(days=random.randint(0, 3))
+    for month in range(months):
+        month_start = add_months(start, month)
+        salary_date = month_start + timedelta(days=rng.randint(0, 5))
+        rent_date = month_start + timedelta(days=4 + rng.randint(0, 3))
+        loan_date = month_start + timedelta(days=14 + rng.randint(0, 3))
 
-        transactions.append([salary_date.strftime("%Y-%m-%d"), "Salary", round(random.uniform(3000, 7000), 2), "Deposits"])
-        transactions.append([rent_date.strftime("%Y-%m-%d"), "Rent Payment", round(random.uniform(800, 2500), 2) * -1, "Fixed Expenses"])
-        transactions.append([loan_date.strftime("%Y-%m-%d"), "Loan Payment", round(random.uniform(200, 800), 2) * -1, "Debt Payments"])
+        transactions.append([salary_date.strftime("%Y-%m-%d"), "Salary", round(rng.uniform(3000, 7000), 2), "Deposits"])
+        transactions.append([rent_date.strftime("%Y-%m-%d"), "Rent Payment", round(rng.uniform(800, 2500), 2) * -1, "Fixed Expenses"])
+        transactions.append([loan_date.strftime("%Y-%m-%d"), "Loan Payment", round(rng.uniform(200, 800), 2) * -1, "Debt Payments"])
 
+    category_names = list(categories.keys())
     for _ in range(num_transactions):
-        date = start + timedelta(days=random.randint(0, (end - start).days))
-        category = random.choice(list(categories.keys()))
-        description = random.choice(categories[category])
+        date = start + timedelta(days=rng.randint(0, (end - start).days))
+        category = rng.choice(category_names)
+        description = rng.choice(categories[category])
 
         # Assign transaction amounts based on category
         if category == "Deposits":
-            amount = round(random.uniform(50, 7000), 2)
+            amount = round(rng.uniform(50, 7000), 2)
         elif category == "Fixed Expenses":
-            amount = round(random.uniform(50, 3000), 2) * -1
+            amount = round(rng.uniform(50, 3000), 2) * -1
         elif category == "Variable Expenses":
-            amount = round(random.uniform(10, 500), 2) * -1
+            amount = round(rng.uniform(10, 500), 2) * -1
         elif category == "Debt Payments":
-            amount = round(random.uniform(100, 1500), 2) * -1
+            amount = round(rng.uniform(100, 1500), 2) * -1
 
         transactions.append([date.strftime("%Y-%m-%d"), description, amount, category])
 
-    anomaly_dates = [start + timedelta(days=random.randint(0, (end - start).days)) for _ in range(3)]
+    anomaly_dates = [start + timedelta(days=rng.randint(0, (end - start).days)) for _ in range(3)]
     for date in anomaly_dates:
-        transactions.append([date.strftime("%Y-%m-%d"), "Emergency Expense", round(random.uniform(5000, 10000), 2) * -1, "Anomalies"])
+        transactions.append([date.strftime("%Y-%m-%d"), "Emergency Expense", round(rng.uniform(5000, 10000), 2) * -1, "Anomalies"])
 
     return transactions
 
-def generate_pdf(df, filename):
-    doc = SimpleDocTemplate(filename, pagesize=letter)
-    elements = []
 
-    data = [["Date", "Description", "Amount", "Category"]] + df.values.tolist()
+def transaction_frame(transactions):
+    df = pd.DataFrame(transactions, columns=["Date", "Description", "Amount", "Category"])
+    return df.sort_values("Date", kind="stable").reset_index(drop=True)
+
+
+def layout_rows(df, layout):
+    """Header and body rows for a layout variant.
 
-    table = Table(data)
-    style = TableStyle([
+    grid and plain show a signed Amount column; split shows separate
+    Debit/Credit columns with a running balance, like most real statements.
+    """
+    if layout != "split":
+        return ["Date", "Description", "Amount", "Category"], df.values.tolist()
+    balance = df["Amount"].cumsum().round(2)
+    body = [
+        [date, description, f"{-amount:.2f}" if amount < 0 else "", f"{amount:.2f}" if amount > 0 else "", f"{total:.2f}"]
+        for date, description, amount, total in zip(df["Date"], df["Description"], df["Amount"], balance)
+    ]
+    return ["Date", "Description", "Debit", "Credit", "Balance"], body
+
+
+def table_style(layout):
+    if layout == "plain":
+        return TableStyle([
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('LINEBELOW', (0, 0), (-1, 0), 0.5, colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ])
+    return TableStyle([
         ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
         ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
         ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
@@ -72,18 +107,82 @@ def generate_pdf(df, filename):
         ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
         ('GRID', (0, 0), (-1, -1), 1, colors.black),
     ])
-    table.setStyle(style)
-    elements.append(table)
+
+
+def generate_pdf(df, filename, layout="grid", pages=None, tables_per_page=1):
+    """Render transactions as a PDF of tables_per_page tables on each page.
+
+    When pages is set the rows are spread evenly over that many page groups
+    (tables too tall for a page continue on the next); otherwise each page
+    holds about ROWS_PER_PAGE rows.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout {layout!r}; expected one of {LAYOUTS}")
+    doc = SimpleDocTemplate(filename, pagesize=letter)
+    header, body = layout_rows(df, layout)
+    if pages:
+        rows_per_table = math.ceil(len(body) / (pages * tables_per_page))
+    else:
+        # Each extra table on a page costs roughly one row for its header and spacing
+        rows_per_table = ROWS_PER_PAGE // tables_per_page - 1
+    rows_per_table = max(1, rows_per_table)
+    style = table_style(layout)
+    styles = getSampleStyleSheet()
+
+    elements = []
+    tables = [body[i:i + rows_per_table] for i in range(0, len(body), rows_per_table)] or [[]]
+    for index, rows in enumerate(tables):
+        if index and index % tables_per_page == 0:
+            elements.append(PageBreak())
+        elif index:
+            elements.append(Spacer(1, 12))
+        if index % tables_per_page == 0:
+            elements.append(Paragraph(f"Statement page {index // tables_per_page + 1}", styles["Heading4"]))
+        # Tables too long for one page are split by reportlab with the header repeated
+        table = Table([header] + rows, repeatRows=1)
+        table.setStyle(style)
+        elements.append(table)
 
     doc.build(elements)
 
-for i in range(1, 11):
-    df = pd.DataFrame(generate_transactions(), columns=["Date", "Description", "Amount", "Category"])
-    df.sort_values("Date", inplace=True)
-    csv_filename = os.path.join(output_folder, f"bank_statement_{i}.csv")
-    pdf_filename = os.path.join(output_folder, f"bank_statement_{i}.pdf")
-    df.to_csv(csv_filename, index=False)
-    generate_pdf(df, pdf_filename)
-    print(f"Generated: {csv_filename} and {pdf_filename}")
 
-print("\n10 synthetic bank statements saved in 'synthetic_statements' folder!")
+def generate_statements(count=10, num_transactions=100, months=12, pages=None, tables_per_page=1,
+                        layout="grid", seed=None, output_folder="synthetic_statements"):
+    """Write count statements as CSV and PDF pairs and return the PDF paths.
+
+    layout="mixed" cycles through every layout variant.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for i in range(1, count + 1):
+        df = transaction_frame(generate_transactions(num_transactions, months, rng=rng))
+        csv_filename = os.path.join(output_folder, f"bank_statement_{i}.csv")
+        pdf_filename = os.path.join(output_folder, f"bank_statement_{i}.pdf")
+        df.to_csv(csv_filename, index=False)
+        statement_layout = LAYOUTS[(i - 1) % len(LAYOUTS)] if layout == "mixed" else layout
+        generate_pdf(df, pdf_filename, statement_layout, pages, tables_per_page)
+        print(f"Generated: {csv_filename} and {pdf_filename}")
+        paths.append(pdf_filename)
+    return paths
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Generate synthetic bank statements as CSV and PDF.")
+    arg_parser.add_argument("--count", type=int, default=10, help="Number of statements")
+    arg_parser.add_argument("--transactions", type=int, default=100, help="Random transactions per statement")
+    arg_parser.add_argument("--months", type=int, default=12)
+    arg_parser.add_argument("--pages", type=int, default=None, help="Spread rows over this many pages")
+    arg_parser.add_argument("--tables-per-page", type=int, default=1)
+    arg_parser.add_argument("--layout", choices=LAYOUTS + ["mixed"], default="grid")
+    arg_parser.add_argument("--seed", type=int, default=None)
+    arg_parser.add_argument("--output", default="synthetic_statements", help="Output folder")
+    args = arg_parser.parse_args(argv)
+
+    generate_statements(args.count, args.transactions, args.months, args.pages, args.tables_per_page,
+                        args.layout, args.seed, args.output)
+    print(f"\n{args.count} synthetic bank statements saved in '{args.output}' folder!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from result_cache import hash_file
+from transactions import TRANSACTIONS_FILE
+from workspace import WorkspaceManager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    account_id TEXT,
+    stage TEXT,
+    stages TEXT NOT NULL DEFAULT '{}',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+JOB_STAGES = ["parse", "history", "summarize", "final_summary"]
+STATEMENT_FILE = "statement.pdf"
+RESULT_FILE = "result.json"
+SUMMARY_FILE = "result.txt"
+COLUMNS = ["id", "status", "filename", "account_id", "stage", "stages", "attempts", "worker", "error",
+           "created_at", "started_at", "heartbeat", "finished_at"]
+
+
+class JobQueue:
+    """SQLite-backed queue of statement jobs shared by the UI and worker processes.
+
+    Each job owns a directory under job_root holding the uploaded PDF, the
+    extracted tables and the final result, so any page or process can
+    re-attach to it by ID. Job directories idle for longer than retention
+    seconds are garbage-collected.
+    """
+
+    def __init__(self, path="jobs.db", job_root="jobs", retention=7 * 24 * 3600, stale_after=900, max_attempts=2):
+        self.path = path
+        self.workspaces = WorkspaceManager(job_root, ttl=retention)
+        # A running job whose worker stopped heartbeating this long ago is assumed dead
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def job_dir(self, job_id):
+        return self.workspaces.path(job_id)
+
+    def submit(self, data, filename, account_id=None):
+        """Store the uploaded PDF bytes and queue a job for them; returns the job ID."""
+        job_id = uuid.uuid4().hex
+        job_dir = self.workspaces.touch(job_id)
+        with open(os.path.join(job_dir, STATEMENT_FILE), "wb") as file:
+            file.write(data)
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT INTO jobs (id, status, filename, account_id, created_at) VALUES (?, 'queued', ?, ?, ?)",
+                         (job_id, os.path.basename(filename), account_id or None, time.time()))
+        return job_id
+
+    def claim(self, worker):
+        """Atomically hand the oldest queued job to worker, or return None if there is none."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' "
+                         "AND heartbeat < ? AND attempts < ?", (now - self.stale_after, self.max_attempts))
+            conn.execute("UPDATE jobs SET status = 'failed', error = 'worker stopped responding', finished_at = ? "
+                         "WHERE status = 'running' AND heartbeat < ?", (now, now - self.stale_after))
+            row = conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, stages = '{}', "
+                "started_at = ?, heartbeat = ? WHERE id = (SELECT id FROM jobs WHERE status = 'queued' "
+                f"ORDER BY created_at LIMIT 1) RETURNING {', '.join(COLUMNS)}", (worker, now, now)).fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+        return self._row_to_job(row) if row else None
+
+    def update_stage(self, job_id, stage, status="running", **details):
+        """Record a stage's progress; also serves as the worker's heartbeat."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            (stages,) = conn.execute("SELECT stages FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            stages = json.loads(stages)
+            entry = stages.setdefault(stage, {"started_at": now})
+            entry.update(details, status=status)
+            if status != "running":
+                entry["finished_at"] = now
+            conn.execute("UPDATE jobs SET stage = ?, stages = ?, heartbeat = ? WHERE id = ?",
+                         (stage, json.dumps(stages), now, job_id))
+
+    def heartbeat(self, job_id):
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ?", (time.time(), job_id))
+
+    def complete(self, job_id, result):
+        with open(os.path.join(self.job_dir(job_id), RESULT_FILE), "w", encoding="utf-8") as file:
+            json.dump(result, file)
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'done', stage = NULL, finished_at = ? WHERE id = ?",
+                         (time.time(), job_id))
+
+    def fail(self, job_id, error):
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                         (error, time.time(), job_id))
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(self, limit=20):
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM jobs ORDER BY created_at DESC LIMIT ?",
+                                (limit,)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def _row_to_job(self, row):
+        job = dict(zip(COLUMNS, row))
+        job["stages"] = json.loads(job["stages"] or "{}")
+        return job
+
+    def load_result(self, job_id):
+        """A finished job's result with paths to its artifacts, or None if it is unfinished or has expired."""
+        job_dir = self.job_dir(job_id)
+        result_path = os.path.join(job_dir, RESULT_FILE)
+        if not os.path.exists(result_path):
+            return None
+        self.workspaces.touch(job_id)
+        with open(result_path, "r", encoding="utf-8") as file:
+            result = json.load(file)
+        tables_dir = os.path.join(job_dir, "tables")
+        result["table_paths"] = [os.path.join(tables_dir, label) for label in result["tables"]]
+        result["transactions_path"] = os.path.join(tables_dir, TRANSACTIONS_FILE)
+        result["summary_path"] = os.path.join(job_dir, SUMMARY_FILE)
+        # Jobs finished before the hash was recorded get it computed once here
+        result["transactions_hash"] = result.get("transactions_sha256") or hash_file(result["transactions_path"])
+        return result
+
+
+def attach_result(session_state, queue, job_id):
+    """Point session state at a finished job's artifacts so any page can show it; returns the job record.
+
+    Only paths and short texts are kept in session state; pages load tables
+    and transactions from disk when they need them.
+    """
+    job = queue.get(job_id)
+    session_state['job_id'] = job_id
+    if job is None or job["status"] != "done" or session_state.get('attached_job') == job_id:
+        return job
+    result = queue.load_result(job_id)
+    if result is None:
+        job["status"] = "expired"
+        return job
+
+    session_state.update({
+        'table_paths': result["table_paths"],
+        'transactions_path': result["transactions_path"],
+        'transactions_hash': result["transactions_hash"],
+        'summary_path': result["summary_path"],
+        'chunk_stats': result["chunk_stats"],
+        'final_summary': result["final_summary"],
+        'red_flags': result.get("red_flags"),
+        'trace_id': result["trace_id"],
+        'cache_stats': result.get("cache_stats", {}),
+        'processed': True,
+        'attached_job': job_id,
+    })
+    return job
+
+
+_shared_queue = None
+_shared_lock = threading.Lock()
+
+
+def shared_queue():
+    """Process-wide queue so every page in a Streamlit server uses the same database handle."""
+    global _shared_queue
+    with _shared_lock:
+        if _shared_queue is None:
+            _shared_queue = JobQueue(os.environ.get("JOB_DB", "jobs.db"), os.environ.get("JOB_DIR", "jobs"),
+                                     retention=int(os.environ.get("JOB_RETENTION", 7 * 24 * 3600)))
+        return _shared_queue
@@ -0,0 +1,186 @@
+import argparse
+import atexit
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
+
+from account_store import AccountStore
+from bank_statement_analyzer import BankStatementAnalyzer
+from bank_statement_parser import BankStatementParser
+from job_queue import STATEMENT_FILE, SUMMARY_FILE, JobQueue
+from result_cache import ResultCache, hash_file
+from tracing import tracer
+from transactions import TRANSACTIONS_FILE, load_transactions, save_transactions
+
+HEARTBEAT_INTERVAL = 30
+
+
+class JobWorker:
+    """Pulls statement jobs off the queue and runs the full parse + summarize + decision pipeline."""
+
+    def __init__(self, queue, api_key, cache=None, store=None, poll_interval=1.0, name=None):
+        self.queue = queue
+        self.api_key = api_key
+        self.cache = cache
+        self.store = store
+        self.poll_interval = poll_interval
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+
+    def process(self, job):
+        job_id = job["id"]
+        job_dir = self.queue.job_dir(job_id)
+        tables_dir = os.path.join(job_dir, "tables")
+        file_path = os.path.join(job_dir, STATEMENT_FILE)
+        output_file = os.path.join(job_dir, SUMMARY_FILE)
+        hits, misses = (self.cache.hits, self.cache.misses) if self.cache else (0, 0)
+
+        with tracer.span("pipeline", file=job["filename"], job_id=job_id) as pipeline_span:
+            parser = BankStatementParser(api_key=self.api_key, cache=self.cache)
+            analyzer = BankStatementAnalyzer(cache=self.cache)
+            transactions_path = os.path.join(tables_dir, TRANSACTIONS_FILE)
+            if job["account_id"]:
+                # Repeat applicants: merge into their history and only summarize months that changed
+                statement_hash = hash_file(file_path)
+                if self.store.has_statement(job["account_id"], statement_hash):
+                    # A re-uploaded statement adds nothing, so the job shows the history it is already part of
+                    os.makedirs(tables_dir, exist_ok=True)
+                    save_transactions(self.store.load_transactions(job["account_id"]), transactions_path)
+                    labels = []
+                    self.queue.update_stage(job_id, "parse", "done", skipped=True)
+                    self.queue.update_stage(job_id, "history", "done", changed_months=0)
+                else:
+                    self.queue.update_stage(job_id, "parse")
+                    labels = [os.path.basename(path) for path in parser.parse_statement(file_path, tables_dir)]
+                    transactions = load_transactions(transactions_path)
+                    self.queue.update_stage(job_id, "parse", "done", tables=len(labels), transactions=len(transactions))
+                    self.queue.update_stage(job_id, "history")
+                    changed = self.store.add_statement(job["account_id"], statement_hash, transactions)
+                    self.queue.update_stage(job_id, "history", "done", changed_months=len(changed))
+                self.queue.update_stage(job_id, "summarize")
+                final_summary = analyzer.assess_account(self.store, job["account_id"], output_file)
+                self.queue.update_stage(job_id, "summarize", "done", chunks=len(analyzer.chunk_stats))
+            else:
+                # Pages stream from the parser straight into summarization, so both stages run together
+                labels = []
+
+                def parsed_tables():
+                    for label, markdown, rows in parser.iter_statement(file_path, tables_dir):
+                        labels.append(label)
+                        if len(labels) % 10 == 0:
+                            self.queue.update_stage(job_id, "parse", tables=len(labels))
+                        yield label, markdown, rows
+
+                self.queue.update_stage(job_id, "parse")
+                self.queue.update_stage(job_id, "summarize")
+                analyzer.summarize_tables(parsed_tables(), output_file)
+                self.queue.update_stage(job_id, "parse", "done", tables=len(labels))
+                self.queue.update_stage(job_id, "summarize", "done", chunks=len(analyzer.chunk_stats))
+                self.queue.update_stage(job_id, "final_summary")
+                final_summary = analyzer.generate_final_summary(output_file, load_transactions(transactions_path))
+                self.queue.update_stage(job_id, "final_summary", "done")
+
+        return {
+            "tables": labels,
+            "chunk_stats": analyzer.chunk_stats,
+            "final_summary": final_summary,
+            "red_flags": analyzer.red_flags,
+            "trace_id": pipeline_span["trace_id"],
+            # Pages key their cached frames and figures on this, so they never hash the file themselves
+            "transactions_sha256": hash_file(transactions_path),
+            # Cache counters live in the worker process, so report this job's share with the result
+            "cache_stats": {"hits": self.cache.hits - hits, "misses": self.cache.misses - misses} if self.cache else {},
+        }
+
+    def run_job(self, job):
+        stop = threading.Event()
+
+        def beat():
+            # LLM stages can run for minutes between stage updates
+            while not stop.wait(HEARTBEAT_INTERVAL):
+                self.queue.heartbeat(job["id"])
+
+        heartbeat = threading.Thread(target=beat, daemon=True)
+        heartbeat.start()
+        try:
+            self.queue.complete(job["id"], self.process(job))
+        except Exception as e:
+            traceback.print_exc()
+            current = self.queue.get(job["id"])
+            if current and current["stage"]:
+                self.queue.update_stage(job["id"], current["stage"], "failed")
+            self.queue.fail(job["id"], repr(e))
+        finally:
+            stop.set()
+
+    def run(self, max_jobs=None, stop_event=None):
+        """Process jobs until stop_event is set or max_jobs have run; idles by polling the queue."""
+        processed = 0
+        while not (stop_event and stop_event.is_set()) and (max_jobs is None or processed < max_jobs):
+            job = self.queue.claim(self.name)
+            if job is None:
+                self.queue.workspaces.collect_garbage()
+                time.sleep(self.poll_interval)
+                continue
+            self.run_job(job)
+            processed += 1
+        return processed
+
+
+def worker_main(db_path, job_root, api_key, parent_pid=None, cache_dir="cache", accounts_path="accounts.db"):
+    queue = JobQueue(db_path, job_root)
+    worker = JobWorker(queue, api_key, cache=ResultCache(cache_dir), store=AccountStore(accounts_path))
+    stop_event = threading.Event()
+
+    def watch_parent():
+        # Finish the current job, then exit once the process that started us is gone
+        while not stop_event.wait(5):
+            if parent_pid and os.getppid() != parent_pid:
+                stop_event.set()
+
+    threading.Thread(target=watch_parent, daemon=True).start()
+    worker.run(stop_event=stop_event)
+
+
+def start_local_workers(count, db_path="jobs.db", job_root="jobs", api_key="input-your-key"):
+    """Start count worker processes tied to the lifetime of this process."""
+    # spawn rather than fork: the parent may already hold event-loop and SQLite threads
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for _ in range(count):
+        # Not daemonic, because local extraction starts its own process pool
+        process = context.Process(target=worker_main, args=(db_path, job_root, api_key, os.getpid()))
+        process.start()
+        processes.append(process)
+    if processes:
+        atexit.register(stop_workers, processes)
+    return processes
+
+
+def stop_workers(processes):
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Run statement processing workers against the job queue.")
+    arg_parser.add_argument("--workers", type=int, default=1, help="Worker processes to run")
+    arg_parser.add_argument("--db", default=os.environ.get("JOB_DB", "jobs.db"))
+    arg_parser.add_argument("--job-dir", default=os.environ.get("JOB_DIR", "jobs"))
+    arg_parser.add_argument("--api-key", default=os.environ.get("LLAMA_CLOUD_API_KEY", "input-your-key"))
+    args = arg_parser.parse_args(argv)
+
+    processes = start_local_workers(args.workers, args.db, args.job_dir, args.api_key)
+    print(f"Started {len(processes)} worker(s) on {args.db}")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+
+from langchain_ollama import OllamaLLM
+
+from chunking import estimate_tokens
+from prompts import PrefixTracker
+from tracing import record_llm_usage, tracer
+
+_DONE = object()
+
+
+class LLMClient:
+    """Shared Ollama client that runs every request on one background asyncio loop.
+
+    A single semaphore on that loop caps the number of requests in flight, so
+    callers from any thread (Streamlit sessions, batch workers) can submit as
+    many prompts as they like and the Ollama server only ever sees
+    max_in_flight of them at once. Model handles are created once and reused,
+    and ask Ollama to keep their models loaded for keep_alive between calls.
+    """
+
+    def __init__(self, max_in_flight=None, timeout=300, retries=2, backoff=1.0, base_url=None, keep_alive=None):
+        self.max_in_flight = max_in_flight or int(os.environ.get("OLLAMA_NUM_PARALLEL", 4))
+        # Ollama unloads idle models after 5 minutes by default, which also discards their prompt cache
+        self.keep_alive = keep_alive or os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.base_url = base_url
+        self._models = {}
+        self._models_lock = threading.Lock()
+        self.prefixes = PrefixTracker(self.max_in_flight)
+        # Requests submitted and not yet finished, queued or running; lets a router pick the least busy server
+        self.in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True)
+        self._thread.start()
+
+    def get_model(self, model, num_ctx=4096, **options):
+        key = (model, num_ctx, tuple(sorted(options.items())))
+        with self._models_lock:
+            if key not in self._models:
+                if self.base_url:
+                    options.setdefault("base_url", self.base_url)
+                options.setdefault("keep_alive", self.keep_alive)
+                self._models[key] = OllamaLLM(model=model, num_ctx=num_ctx, **options)
+            return self._models[key]
+
+    async def _retry(self, attempt_call, span):
+        queued = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            span["attributes"]["attempts"] = attempt + 1
+            try:
+                async with self._semaphore:
+                    span["attributes"].setdefault("queue_wait", round(time.perf_counter() - queued, 4))
+                    return await asyncio.wait_for(attempt_call(), self.timeout)
+            except Exception:
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    def _prefix_attributes(self, llm, prompt):
+        input_tokens, prefix_tokens = self.prefixes.observe(llm.model, prompt)
+        return {"input_tokens": input_tokens, "prefix_tokens": prefix_tokens}
+
+    def _track(self, delta):
+        with self._in_flight_lock:
+            self.in_flight += delta
+
+    def load(self):
+        """Share of this client's in-flight limit currently taken."""
+        return self.in_flight / self.max_in_flight
+
+    async def ainvoke(self, llm, prompt, parent=None, schema=None, **attributes):
+        # A JSON schema is sent as Ollama's format, which constrains decoding to matching JSON
+        options = {"format": schema} if schema else {}
+        with tracer.span("llm_call", parent=parent, model=llm.model, num_ctx=llm.num_ctx,
+                         **self._prefix_attributes(llm, prompt), **attributes) as span:
+            result = await self._retry(lambda: llm.agenerate([prompt], **options), span)
+            generation = result.generations[0][0]
+            record_llm_usage(span, generation.generation_info or {})
+            return generation.text
+
+    def submit(self, llm, prompt, parent=None, schema=None, **attributes):
+        """Schedule a prompt on the client loop and return a concurrent.futures.Future.
+
+        With a schema the response is JSON matching it; extra attributes are
+        recorded on the call's span.
+        """
+        self._track(1)
+        # The loop thread has its own context, so hand the caller's span over explicitly
+        future = asyncio.run_coroutine_threadsafe(
+            self.ainvoke(llm, prompt, parent or tracer.current(), schema, **attributes), self._loop)
+        future.add_done_callback(lambda _: self._track(-1))
+        return future
+
+    def invoke_many(self, llm, prompts):
+        futures = [self.submit(llm, prompt) for prompt in prompts]
+        return [future.result() for future in futures]
+
+    def invoke(self, llm, prompt):
+        return self.submit(llm, prompt).result()
+
+    def stream(self, llm, prompt, **attributes):
+        """Yield response tokens as they arrive; retries only happen before the first token."""
+        tokens = queue.Queue()
+        parent = tracer.current()
+
+        async def produce():
+            with tracer.span("llm_stream", parent=parent, model=llm.model, num_ctx=llm.num_ctx,
+                             prompt_tokens=estimate_tokens(prompt), **self._prefix_attributes(llm, prompt),
+                             **attributes) as span:
+                submitted = time.perf_counter()
+                chunks = 0
+                for attempt in range(self.retries + 1):
+                    try:
+                        async with self._semaphore:
+                            async for chunk in llm.astream(prompt):
+                                if not chunks:
+                                    span["attributes"]["first_token_latency"] = round(time.perf_counter() - submitted, 4)
+                                    first_token = time.perf_counter()
+                                chunks += 1
+                                tokens.put(chunk)
+                        break
+                    except Exception as e:
+                        if chunks or attempt == self.retries:
+                            span["status"] = "error"
+                            span["attributes"]["error"] = repr(e)
+                            tokens.put(e)
+                            break
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+                # Ollama streams roughly one token per chunk
+                span["attributes"]["response_tokens"] = chunks
+                if chunks:
+                    elapsed = time.perf_counter() - first_token
+                    span["attributes"]["tokens_per_sec"] = round(chunks / elapsed, 2) if elapsed else None
+            tokens.put(_DONE)
+
+        self._track(1)
+        future = asyncio.run_coroutine_threadsafe(produce(), self._loop)
+        future.add_done_callback(lambda _: self._track(-1))
+        try:
+            while True:
+                try:
+                    item = tokens.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"No tokens from {llm.model} for {self.timeout}s")
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def shared_client():
+    """Process-wide client so every page and session shares one in-flight limit."""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = LLMClient()
+        return _shared_client
@@ -0,0 +1,142 @@
+import multiprocessing
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pdfplumber
+
+from transactions import has_transaction_columns, match_columns, normalize_table, parse_markdown_table
+
+DATE_CELL = re.compile(
+    r"\b\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}\b|\b\d{1,2}[ -](jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\b"
+    r"|\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]* \d{1,2}\b",
+    re.IGNORECASE,
+)
+AMOUNT_CELL = re.compile(r"-?\(?[£$€₹]?\s?\d{1,3}(?:,\d{2,3})*(?:\.\d{2})\)?(?:\s?(?:CR|DR))?", re.IGNORECASE)
+TEXT_TABLE_SETTINGS = {"vertical_strategy": "text", "horizontal_strategy": "text"}
+MIN_TEXT_CHARS = 50
+
+
+def _clean_cell(cell):
+    return "" if cell is None else " ".join(str(cell).split()).replace("|", "/")
+
+
+def table_to_markdown(rows):
+    rows = [[_clean_cell(cell) for cell in row] for row in rows]
+    lines = ["| " + " | ".join(rows[0]) + " |", "|" + "---|" * len(rows[0])]
+    lines.extend("| " + " | ".join(row) + " |" for row in rows[1:])
+    return "\n".join(lines)
+
+
+def _is_transaction_row(cells):
+    text = " ".join(cells)
+    return bool(DATE_CELL.search(text)) and bool(AMOUNT_CELL.search(text))
+
+
+def trim_table(rows):
+    """Clean a pdfplumber table, drop blank spacer rows and start it at its header row.
+
+    The header is the first row naming date and amount columns, or failing
+    that the row just above the first transaction row, so headings extracted
+    above the table ("Statement page 2") are not taken for column names.
+    """
+    rows = [[_clean_cell(cell) for cell in row] for row in rows]
+    rows = [row for row in rows if any(row)]
+    for i, row in enumerate(rows):
+        if has_transaction_columns(match_columns(row)):
+            return rows[i:]
+    for i, row in enumerate(rows):
+        if _is_transaction_row(row):
+            return rows[max(0, i - 1):]
+    return rows
+
+
+def score_table(rows):
+    """Confidence that a trimmed table is a cleanly extracted transaction table.
+
+    Returns (is_transaction_table, confidence). Tables without any date+amount
+    rows (headers, account summaries) are kept with full confidence since there
+    is nothing for LlamaParse to improve on. Transaction tables whose header
+    does not map to date and amount columns score 0, because every row would
+    be lost when the table is normalized.
+    """
+    if len(rows) < 2:
+        return False, 1.0
+    data = rows[1:]
+    transaction_rows = sum(_is_transaction_row(row) for row in data)
+    if transaction_rows == 0:
+        return False, 1.0
+    if not has_transaction_columns(match_columns(rows[0])):
+        return True, 0.0
+    widths = [len(row) for row in rows]
+    consistent = widths.count(max(set(widths), key=widths.count)) / len(widths)
+    filled = sum(bool(cell) for row in data for cell in row) / max(1, sum(len(row) for row in data))
+    return True, min(1.0, transaction_rows / len(data) * 0.5 + consistent * 0.3 + filled * 0.2)
+
+
+def extract_page(path, page_number):
+    """Extract one page's tables from the PDF text layer and score the result."""
+    with pdfplumber.open(path) as pdf:
+        page = pdf.pages[page_number]
+        if len(page.chars) < MIN_TEXT_CHARS:
+            # No usable text layer (scanned image), so this page needs OCR
+            return {"page": page_number, "tables": [], "confidence": 0.0}
+
+        candidates = [trim_table(rows) for rows in page.extract_tables() if rows]
+        if not any(score_table(rows)[0] for rows in candidates):
+            candidates += [trim_table(rows) for rows in page.extract_tables(TEXT_TABLE_SETTINGS) if rows]
+        text_rows = sum(_is_transaction_row([line]) for line in (page.extract_text() or "").split("\n"))
+
+    tables = []
+    extracted_rows = 0
+    scores = []
+    for rows in candidates:
+        is_transactions, confidence = score_table(rows)
+        if is_transactions:
+            markdown = table_to_markdown(rows)
+            tables.append(markdown)
+            # Count rows that survive normalization, so cells that look like transactions but cannot be typed
+            # (dates without a year, say) lower coverage and send the page to LlamaParse instead of vanishing
+            normalized = normalize_table(parse_markdown_table(markdown))
+            extracted_rows += 0 if normalized is None else len(normalized)
+            scores.append(confidence)
+
+    if not scores:
+        # Transaction-looking lines with no table found means the layout defeated local extraction
+        return {"page": page_number, "tables": [], "confidence": 1.0 if text_rows < 3 else 0.0}
+    coverage = min(1.0, extracted_rows / text_rows) if text_rows else 1.0
+    return {"page": page_number, "tables": tables, "confidence": min(scores) * coverage}
+
+
+def page_count(path):
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def iter_local(path, pages=None, max_workers=None):
+    """Yield extract_page results in page order, spreading pages over a process pool.
+
+    At most two pages per worker are in flight, so memory stays bounded
+    however long the statement is.
+    """
+    pages = list(range(page_count(path))) if pages is None else list(pages)
+    if len(pages) <= 1:
+        for page_number in pages:
+            yield extract_page(path, page_number)
+        return
+    workers = min(len(pages), max_workers or os.cpu_count() or 1)
+    # spawn rather than fork: job workers already run event-loop and heartbeat threads, which fork would copy mid-state
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        window = deque()
+        for page_number in pages:
+            window.append(executor.submit(extract_page, path, page_number))
+            if len(window) >= workers * 2:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+
+def extract_local(path, max_workers=None):
+    """Extract tables from every page."""
+    return list(iter_local(path, max_workers=max_workers))
@@ -0,0 +1,137 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# "card payment" alone is how UK banks label every debit-card purchase, so only credit card issuers count as debt
+DEBT_PATTERN = re.compile(r"loan|mortgage|credit card|amex|american express|barclaycard|capital one|mbna|"
+                          r"finance|repayment|instal+ment|debt|bnpl|klarna", re.IGNORECASE)
+FEE_PATTERN = re.compile(r"overdraft|\bnsf\b|insufficient funds|returned item|unpaid item|late fee|bounced", re.IGNORECASE)
+INCOME_EXCLUDE_PATTERN = re.compile(r"transfer from|refund|reversal", re.IGNORECASE)
+
+
+def normalize_description(descriptions):
+    """Lower-case descriptions and strip digits/punctuation so recurring payees group together."""
+    text = pd.Series(descriptions, dtype="object").fillna("").astype(str).str.lower()
+    text = text.str.replace(r"[\d#*/\-_.:,]+", " ", regex=True)
+    return text.str.replace(r"\s+", " ", regex=True).str.strip()
+
+
+def _coefficient_of_variation(values):
+    values = np.asarray(values, dtype="float64")
+    mean = values.mean() if values.size else 0.0
+    if values.size < 2 or mean == 0:
+        return 0.0
+    return float(values.std(ddof=0) / abs(mean))
+
+
+def _debt_mask(frame):
+    mask = frame["description"].astype(str).str.contains(DEBT_PATTERN)
+    if "category" in frame:
+        mask |= frame["category"].fillna("").astype(str).str.contains(r"debt|loan", case=False)
+    return mask & (frame["amount"] < 0)
+
+
+def recurring_payments(frame, min_months=3, max_cv=0.25):
+    """Debits from the same payee in at least min_months distinct months with a stable amount."""
+    debits = frame[frame["amount"] < 0]
+    if debits.empty:
+        return pd.DataFrame(columns=["payee", "months", "average", "cv"])
+    grouped = pd.DataFrame({
+        "payee": normalize_description(debits["description"]).values,
+        "month": debits["date"].dt.to_period("M").values,
+        "amount": debits["amount"].abs().values,
+    }).groupby("payee")
+    summary = grouped.agg(months=("month", "nunique"), average=("amount", "mean"), std=("amount", "std"))
+    summary["cv"] = (summary["std"].fillna(0.0) / summary["average"]).fillna(0.0)
+    summary = summary[(summary["months"] >= min_months) & (summary["cv"] <= max_cv)]
+    return summary.drop(columns="std").reset_index().sort_values("average", ascending=False)
+
+
+def category_totals(frame):
+    """Total expense per category; income rows are excluded."""
+    expenses = frame[(frame["amount"] < 0) & frame["category"].notna()]
+    totals = expenses.assign(amount=expenses["amount"].abs()).groupby("category")["amount"].sum()
+    return totals[totals > 0].round(2).sort_values(ascending=False)
+
+
+def compute_metrics(frame):
+    """Compute underwriting metrics over a transaction frame from transactions.build_transaction_frame."""
+    if frame is None or frame.empty:
+        return {}
+
+    month = frame["date"].dt.to_period("M")
+    credits = frame["amount"].where(frame["amount"] > 0, 0.0)
+    income = credits.where(~frame["description"].astype(str).str.contains(INCOME_EXCLUDE_PATTERN), 0.0)
+    spending = -frame["amount"].where(frame["amount"] < 0, 0.0)
+    debt = spending.where(_debt_mask(frame), 0.0)
+
+    monthly = pd.DataFrame({"income": income, "spending": spending, "debt": debt}).groupby(month).sum()
+    months = len(monthly)
+    avg_income = monthly["income"].mean()
+    avg_debt = monthly["debt"].mean()
+    total_income = monthly["income"].sum()
+
+    balances = frame["balance"].dropna()
+    fees = frame[frame["description"].astype(str).str.contains(FEE_PATTERN)]
+    recurring = recurring_payments(frame)
+
+    return {
+        "period_start": frame["date"].min().strftime("%Y-%m-%d"),
+        "period_end": frame["date"].max().strftime("%Y-%m-%d"),
+        "months": months,
+        "transactions": len(frame),
+        "monthly_income": {str(k): round(v, 2) for k, v in monthly["income"].items()},
+        "average_monthly_income": round(avg_income, 2),
+        "income_cv": round(_coefficient_of_variation(monthly["income"]), 3),
+        "months_without_income": int((monthly["income"] <= 0).sum()),
+        "average_monthly_spending": round(monthly["spending"].mean(), 2),
+        "total_debt_payments": round(monthly["debt"].sum(), 2),
+        "average_monthly_debt_payments": round(avg_debt, 2),
+        "dti_percent": round(avg_debt / avg_income * 100, 1) if avg_income > 0 else None,
+        "savings_rate_percent": round((total_income - monthly["spending"].sum()) / total_income * 100, 1) if total_income > 0 else None,
+        "negative_balance_events": int((balances < 0).sum()),
+        "lowest_balance": round(balances.min(), 2) if not balances.empty else None,
+        "overdraft_fee_events": len(fees),
+        "overdraft_fee_total": abs(round(fees["amount"].clip(upper=0).sum(), 2)),
+        "recurring_payments": [
+            {"payee": row.payee, "months": int(row.months), "average": round(row.average, 2)}
+            for row in recurring.head(10).itertuples()
+        ],
+    }
+
+
+def dti_band(dti):
+    if dti is None:
+        return "unknown"
+    if dti < 20:
+        return "excellent"
+    if dti <= 35:
+        return "manageable"
+    return "risky"
+
+
+def format_fact_sheet(metrics):
+    """Render metrics as a compact plain-text block for LLM prompts."""
+    if not metrics:
+        return "No structured transaction data was available."
+
+    def value(number, suffix=""):
+        return "n/a" if number is None else f"{number:,.2f}{suffix}"
+
+    lines = [
+        f"Period: {metrics['period_start']} to {metrics['period_end']} ({metrics['months']} months, {metrics['transactions']} transactions)",
+        "Monthly income: " + ", ".join(f"{month} {amount:,.2f}" for month, amount in metrics["monthly_income"].items()),
+        f"Average monthly income: {value(metrics['average_monthly_income'])} (coefficient of variation {metrics['income_cv']:.2f}, "
+        f"{metrics['months_without_income']} months without income)",
+        f"Average monthly spending: {value(metrics['average_monthly_spending'])}",
+        f"Debt payments: {value(metrics['total_debt_payments'])} total, {value(metrics['average_monthly_debt_payments'])} per month",
+        f"DTI: {value(metrics['dti_percent'], '%')} ({dti_band(metrics['dti_percent'])})",
+        f"Savings rate: {value(metrics['savings_rate_percent'], '%')}",
+        f"Negative balance events: {metrics['negative_balance_events']} (lowest balance {value(metrics['lowest_balance'])})",
+        f"Overdraft/NSF fees: {metrics['overdraft_fee_events']} totalling {value(metrics['overdraft_fee_total'])}",
+    ]
+    if metrics["recurring_payments"]:
+        lines.append("Recurring payments: " + "; ".join(
+            f"{item['payee']} ~{item['average']:,.2f} x{item['months']} months" for item in metrics["recurring_payments"]))
+    return "\n".join(lines)
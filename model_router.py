@@ -0,0 +1,197 @@
+import json
+import os
+import threading
+import zlib
+from concurrent.futures import Future
+
+from jsonschema import Draft202012Validator
+
+from chunking import estimate_tokens
+from llm_client import LLMClient, shared_client
+from prompts import SEPARATOR
+from tracing import tracer
+
+
+class Route:
+    """The model tiers for one kind of request.
+
+    Prompts up to small_tokens go to the small model; longer ones, and any
+    small-model response that fails validation, go to the large model. A route
+    without a distinct small model always uses the large one. With a schema,
+    responses are constrained to matching JSON and checked against it before
+    validate sees them; large-model responses that still fail are retried
+    up to retries times. With enforce_schema off the schema only constrains
+    generation and validate alone judges responses, for callers that keep
+    the valid part of a partial answer and re-ask only for the rest.
+    """
+
+    def __init__(self, name, large, small=None, num_ctx=4096, small_tokens=1500, validate=None, schema=None,
+                 retries=1, enforce_schema=True, **options):
+        self.name = name
+        self.large = large
+        self.small = small if small and small != large else None
+        self.num_ctx = num_ctx
+        self.small_tokens = small_tokens
+        self.validate = validate
+        self.schema = schema
+        self.retries = retries
+        self.enforce_schema = enforce_schema
+        self.options = options
+
+    @property
+    def model(self):
+        # Identifies the route's models in cache keys, so changing a tier invalidates its cached answers
+        return f"{self.small}>{self.large}" if self.small else self.large
+
+    def tier(self, prompt):
+        return "small" if self.small and estimate_tokens(prompt) <= self.small_tokens else "large"
+
+    def small_budget(self, instructions):
+        """Content tokens that keep a prompt assembled after instructions on the small tier, or None without one."""
+        if not self.small:
+            return None
+        return max(1, self.small_tokens - estimate_tokens(instructions) - estimate_tokens(SEPARATOR))
+
+    def check(self, text, schema=None):
+        schema = schema or self.schema
+        if schema and self.enforce_schema and parse_structured(text, schema) is None:
+            return False
+        return self.validate(text) if self.validate else True
+
+
+def parse_structured(text, schema):
+    """The JSON value in text if it matches schema, otherwise None."""
+    try:
+        value = json.loads(text)
+    except (TypeError, ValueError):
+        return None
+    if next(Draft202012Validator(schema).iter_errors(value), None) is not None:
+        return None
+    return value
+
+
+class ModelRouter:
+    """Sends each request to a model tier and to one of several Ollama endpoints.
+
+    Requests are pinned to an endpoint by a hash of their stable prefix (the
+    route and the prompt's instructions, or a conversation's transcript
+    prefix), so prompts that share a prefix reach the server whose prompt
+    cache already holds it. They only overflow to the least busy endpoint
+    when their own is full and another has room. Every endpoint gets its own
+    LLMClient, and so its own in-flight limit.
+    Escalations from the small to the large model are traced as
+    llm_escalation spans, and every llm_call span records its route and
+    tier, so escalation rates and per-model latency come from the traces.
+    """
+
+    def __init__(self, clients=None):
+        self.clients = clients or [shared_client()]
+
+    @property
+    def max_in_flight(self):
+        return sum(client.max_in_flight for client in self.clients)
+
+    def client(self, affinity=None):
+        """The endpoint for a request with the given affinity key; least busy when there is none."""
+        least_busy = min(self.clients, key=lambda client: client.load())
+        if affinity is None or len(self.clients) == 1:
+            return least_busy
+        # crc32 rather than hash(), so every process (UI and workers) pins a prefix to the same endpoint
+        pinned = self.clients[zlib.crc32(affinity.encode("utf-8")) % len(self.clients)]
+        # load() is the share of an endpoint's in-flight limit taken, so 1 means full
+        if pinned.load() >= 1 and least_busy.load() < 1:
+            return least_busy
+        return pinned
+
+    def affinity(self, route, prompt, affinity=None):
+        return f"{route.name}{SEPARATOR}{affinity if affinity is not None else prompt.split(SEPARATOR, 1)[0]}"
+
+    def get_model(self, route, tier, affinity=None):
+        client = self.client(affinity)
+        model = route.small if tier == "small" else route.large
+        return client, client.get_model(model, num_ctx=route.num_ctx, **route.options)
+
+    def submit(self, route, prompt, tier=None, schema=None):
+        """Start a request on route and return a Future for its response.
+
+        The Future holds the first response that passes validation, or the
+        last one once escalation and retries are used up, so callers still
+        check what they parse. schema overrides the route's for this call.
+        """
+        tier = tier or route.tier(prompt)
+        schema = schema or route.schema
+        affinity = self.affinity(route, prompt)
+        parent = tracer.current()
+        result = Future()
+        retries_left = [route.retries]
+
+        def start(tier, **attributes):
+            client, llm = self.get_model(route, tier, affinity)
+            future = client.submit(llm, prompt, parent, schema, route=route.name, tier=tier, **attributes)
+            future.add_done_callback(lambda done: finish(done, tier))
+
+        def finish(done, tier):
+            error = done.exception()
+            if error is None and route.check(done.result(), schema):
+                return result.set_result(done.result())
+            reason = repr(error) if error is not None else "validation failed"
+            if tier == "small":
+                with tracer.span("llm_escalation", parent=parent, route=route.name, from_model=route.small,
+                                 to_model=route.large, reason=reason):
+                    pass
+                return start("large", escalated=True)
+            if error is None and retries_left[0] > 0:
+                # Only this request is redone; the rest of its batch has already been accepted
+                retries_left[0] -= 1
+                with tracer.span("llm_retry", parent=parent, route=route.name, model=route.large, reason=reason):
+                    pass
+                return start("large", retried=True)
+            if error is not None:
+                return result.set_exception(error)
+            result.set_result(done.result())
+
+        start(tier)
+        return result
+
+    def invoke_many(self, route, prompts, schemas=None, tier=None):
+        schemas = schemas or [None] * len(prompts)
+        futures = [self.submit(route, prompt, tier, schema) for prompt, schema in zip(prompts, schemas)]
+        return [future.result() for future in futures]
+
+    def invoke(self, route, prompt):
+        return self.submit(route, prompt).result()
+
+    def stream(self, route, prompt, tier=None, affinity=None):
+        """Stream from the chosen tier; a stream cannot be validated before it is shown, so it never escalates.
+
+        Pass a conversation's prefix as affinity so all of its turns go to one endpoint.
+        """
+        tier = tier or route.tier(prompt)
+        client, llm = self.get_model(route, tier, self.affinity(route, prompt, affinity))
+        return client.stream(llm, prompt, route=route.name, tier=tier)
+
+
+def endpoint_clients(urls=None):
+    """One client per Ollama endpoint in OLLAMA_ENDPOINTS (comma-separated), or the shared client."""
+    urls = urls or [url.strip() for url in os.environ.get("OLLAMA_ENDPOINTS", "").split(",") if url.strip()]
+    if not urls:
+        return [shared_client()]
+    return [LLMClient(base_url=url) for url in urls]
+
+
+_shared_router = None
+_shared_lock = threading.Lock()
+
+
+def shared_router():
+    """Process-wide router so every page and session shares the endpoints' in-flight limits."""
+    global _shared_router
+    with _shared_lock:
+        if _shared_router is None:
+            _shared_router = ModelRouter(endpoint_clients())
+        return _shared_router
+
+
+def small_model(default="gemma2:2b"):
+    """Small-tier model from OLLAMA_SMALL_MODEL; set it empty to disable tiering."""
+    return os.environ.get("OLLAMA_SMALL_MODEL", default) or None
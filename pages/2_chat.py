@@ -1,13 +1,62 @@
 import streamlit as st
 from streamlit_chat import message
-from langchain_ollama import OllamaLLM
-
+from langchain_ollama import OllamaEmbeddings
+from model_router import Route, shared_router, small_model
+from chat_index import CHAT_PROMPT, ChatIndex, answer_numeric, split_summaries, transaction_documents
+from display import load_statement
+from metrics import compute_metrics, format_fact_sheet
+from anomalies import detect_anomalies, format_anomalies
+from prompts import Conversation
+from tracing import tracer
+from job_queue import attach_result, shared_queue
+import os
 
 st.title("💬 Chat with Bank Statement AI")
 
+# Re-attach to the statement job this session (or the ?job= link) started, even after a reload
+job_id = st.session_state.get('job_id') or st.query_params.get('job')
+if job_id:
+    attach_result(st.session_state, shared_queue(), job_id)
+
 if 'chat_messages' not in st.session_state:
     st.session_state.chat_messages = []
 
+
+def load_statement_transactions():
+    path = st.session_state.get("transactions_path")
+    return load_statement(path, st.session_state["transactions_hash"]) if path and os.path.exists(path) else None
+
+
+def get_chat_index():
+    """Build the retrieval index once per processed statement rather than on every message."""
+    key = st.session_state.get("summary_path")
+    if st.session_state.get("chat_index_key") != key:
+        summaries = ""
+        if key and os.path.exists(key):
+            with open(key, "r", encoding="utf-8") as file:
+                summaries = file.read()
+        # Embeddings are optional; set OLLAMA_EMBED_MODEL (e.g. nomic-embed-text) to enable hybrid search
+        embed_model = os.environ.get("OLLAMA_EMBED_MODEL")
+        embedder = OllamaEmbeddings(model=embed_model) if embed_model else None
+        documents = transaction_documents(load_statement_transactions()) + split_summaries(summaries)
+        st.session_state["chat_index"] = ChatIndex(documents, embedder=embedder)
+        st.session_state["chat_index_key"] = key
+    return st.session_state["chat_index"]
+
+
+def get_conversation(num_ctx):
+    """One append-only transcript per statement, so each turn's prompt extends the previous one."""
+    key = st.session_state.get("summary_path")
+    if st.session_state.get("conversation_key") != key:
+        transactions = load_statement_transactions()
+        facts = None
+        if transactions is not None and not transactions.empty:
+            facts = f"{format_fact_sheet(compute_metrics(transactions))}\n{format_anomalies(detect_anomalies(transactions))}"
+        st.session_state["conversation"] = Conversation(CHAT_PROMPT, facts and f"Fact sheet:\n{facts}", num_ctx)
+        st.session_state["conversation_key"] = key
+    return st.session_state["conversation"]
+
+
 for idx, chat_message in enumerate(st.session_state.chat_messages):
     message(chat_message['content'], 
             is_user=(chat_message['role'] == 'user'), 
@@ -21,12 +70,22 @@ if user_input:
         "content": user_input
     })
     
-    llm = OllamaLLM(model="gemma2:9b", num_ctx=8192)
-    
-    
+    route = Route("chat", "gemma2:9b", small_model(), num_ctx=8192)
+
+    message(user_input, is_user=True, key=f"chat_{len(st.session_state.chat_messages) - 1}")
+    # Only the rows and summaries relevant to the question go into the turn
+    context = "\n".join(get_chat_index().search(user_input, k=25))
+    facts = answer_numeric(user_input, load_statement_transactions())
+    evidence = "\n".join(part for part in (facts, context) if part)
+    conversation = get_conversation(route.num_ctx)
+    prompt = conversation.prompt(user_input, evidence)
+    # Figures computed from the transactions only need restating, which the small model does well
+    tier = "small" if facts else "large"
 
-    response = llm.invoke(f'{user_input}\n\n{st.session_state["chat_file"]}')
-    print(st.session_state["chat_file"])
+    # Render tokens as they arrive instead of blocking until the full answer is ready
+    with tracer.span("chat_response", turn=len(conversation.turns) + 1, tier=tier), st.chat_message("assistant"):
+        response = st.write_stream(shared_router().stream(route, prompt, tier, conversation.prefix))
+    conversation.record(user_input, evidence, response)
     st.session_state.chat_messages.append({
         "role": "bot",
         "content": response
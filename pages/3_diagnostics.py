@@ -0,0 +1,58 @@
+import streamlit as st
+import pandas as pd
+import json
+from tracing import escalation_rate, load_spans, model_latency, prefix_hit_rate, stage_percentiles, to_otel, tracer
+
+
+st.set_page_config(page_title="Diagnostics", layout="wide")
+st.title("⏱️ Pipeline Diagnostics")
+
+spans = load_spans(tracer.path) if tracer.path else list(tracer.spans)
+
+if not spans:
+    st.write("No traces recorded yet. Process a statement first.")
+    st.stop()
+
+st.subheader("Stage timings across runs (seconds)")
+st.dataframe(stage_percentiles(spans), use_container_width=True)
+
+trace_id = st.session_state.get('trace_id') or spans[-1]['trace_id']
+trace = [span for span in spans if span['trace_id'] == trace_id]
+if trace:
+    st.subheader("Latest run")
+    start = min(span['start'] for span in trace)
+    st.dataframe(pd.DataFrame([{
+        "stage": span['name'],
+        "offset_s": round(span['start'] - start, 3),
+        "duration_s": round(span['duration'], 3),
+        "status": span['status'],
+        **span['attributes'],
+    } for span in sorted(trace, key=lambda span: span['start'])]), hide_index=True, use_container_width=True)
+
+    llm_spans = [span for span in trace if span['name'] in ("llm_call", "llm_stream")]
+    if llm_spans:
+        cols = st.columns(4)
+        cols[0].metric("LLM calls", len(llm_spans))
+        cols[1].metric("Prompt tokens", sum(span['attributes'].get('prompt_tokens') or 0 for span in llm_spans))
+        cols[2].metric("Response tokens", sum(span['attributes'].get('response_tokens') or 0 for span in llm_spans))
+        hit_rate = prefix_hit_rate(llm_spans)
+        cols[3].metric("Prefix cache hit rate (est.)", f"{hit_rate:.0%}" if hit_rate is not None else "n/a",
+                       help="Client-side estimate of the share of prompt tokens Ollama could reuse from its prompt "
+                            "cache, simulated per process from this app's own requests; the Prompt tokens figure "
+                            "is what Ollama reported evaluating")
+
+st.subheader("LLM latency per model (seconds)")
+latency = model_latency(spans)
+if latency.empty:
+    st.write("No LLM calls recorded yet.")
+else:
+    rate = escalation_rate(spans)
+    st.metric("Escalation rate", f"{rate:.0%}" if rate is not None else "n/a",
+              help="Share of small-model answers that failed validation and were redone by the large model")
+    st.dataframe(latency, use_container_width=True)
+
+col1, col2 = st.columns(2)
+col1.download_button("Download latest run (OpenTelemetry JSON)", json.dumps(to_otel(trace)),
+                     file_name=f"trace-{trace_id}.json", mime="application/json")
+col2.download_button("Download all spans (JSON lines)", "\n".join(json.dumps(span) for span in spans),
+                     file_name="traces.jsonl", mime="application/json")
@@ -0,0 +1,89 @@
+import threading
+from collections import deque
+
+from chunking import estimate_tokens, token_budget
+
+SEPARATOR = "\n\n"
+
+
+def assemble(instructions, context=None, content=None):
+    """Join prompt parts from most to least stable.
+
+    Ollama keeps the evaluated prompt of each request in its slot and only
+    re-evaluates tokens after the longest prefix shared with the next
+    request, so the instructions go first, then context shared by every call
+    about one statement, and only then the part that changes per call.
+    """
+    return SEPARATOR.join(part for part in (instructions, context, content) if part)
+
+
+def shared_prefix(a, b):
+    """Length of the common leading substring of a and b."""
+    limit = min(len(a), len(b))
+    if a[:limit] == b[:limit]:
+        return limit
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+class PrefixTracker:
+    """Estimates how much of each prompt Ollama can serve from its prompt cache.
+
+    Mirrors the server: each model has `slots` cached prompts, a request goes
+    to the slot sharing the longest prefix with it (or the least recently
+    used one) and replaces that slot's prompt.
+    """
+
+    def __init__(self, slots=4):
+        self.slots = slots
+        self._prompts = {}
+        self._lock = threading.Lock()
+
+    def observe(self, model, prompt):
+        """Record a prompt sent to model; returns (prompt tokens, tokens covered by a cached prefix)."""
+        with self._lock:
+            cached = self._prompts.setdefault(model, deque(maxlen=self.slots))
+            best, shared = None, 0
+            for i, previous in enumerate(cached):
+                length = shared_prefix(previous, prompt)
+                if length > shared:
+                    best, shared = i, length
+            if best is not None:
+                del cached[best]
+            cached.append(prompt)
+        return estimate_tokens(prompt), estimate_tokens(prompt[:shared]) if shared else 0
+
+
+class Conversation:
+    """Multi-turn chat prompt that only ever grows at the end.
+
+    Every turn's prompt is the previous turn's prompt plus the answer and the
+    new question, so Ollama re-evaluates only the new tokens. When the
+    transcript outgrows the context window the oldest half of the turns is
+    dropped at once, which costs one full re-evaluation instead of one on
+    every later turn.
+    """
+
+    def __init__(self, instructions, context, num_ctx=8192, response_reserve=1024):
+        self.prefix = assemble(instructions, context)
+        self.budget = token_budget(num_ctx, self.prefix, response_reserve)
+        self.turns = []
+
+    def _turn(self, question, evidence, answer=None):
+        turn = f"User: {question}\nRelevant data:\n{evidence}\nAssistant:" if evidence else f"User: {question}\nAssistant:"
+        return f"{turn} {answer}" if answer is not None else turn
+
+    def prompt(self, question, evidence=None):
+        new_turn = self._turn(question, evidence)
+        while self.turns and estimate_tokens("\n\n".join(self.turns + [new_turn])) > self.budget:
+            self.turns = self.turns[(len(self.turns) + 1) // 2:]
+        return assemble(self.prefix, "\n\n".join(self.turns), new_turn)
+
+    def record(self, question, evidence, answer):
+        self.turns.append(self._turn(question, evidence, answer))
@@ -0,0 +1,155 @@
+import argparse
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from prompts import PrefixTracker
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    """Answers the subset of Ollama's HTTP API the app uses, with configurable latency."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": []})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        request = self._read_json()
+        if self.path == "/api/generate":
+            self._generate(request)
+        elif self.path == "/api/embed":
+            inputs = request.get("input") or []
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            self._send_json({"model": request.get("model"), "embeddings": [self.server.embed(text) for text in inputs]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def _generate(self, request):
+        server = self.server
+        prompt = request.get("prompt", "")
+        schema = request.get("format")
+        text = json.dumps(self._example(schema)) if schema else server.response_text
+        tokens = [text] if schema else [word + " " for word in text.split()]
+        with server.slots:
+            # Like Ollama, only tokens after the longest prefix already cached in a slot are evaluated
+            input_tokens, cached_tokens = server.prompt_cache.observe(request.get("model"), prompt)
+            evaluated = max(1, input_tokens - cached_tokens)
+            time.sleep(server.latency + evaluated * server.prompt_token_delay)
+            started = time.perf_counter()
+            base = {"model": request.get("model"), "created_at": datetime.now(timezone.utc).isoformat()}
+            final = dict(base, response="", done=True, done_reason="stop",
+                         prompt_eval_count=evaluated, eval_count=len(tokens))
+
+            if not request.get("stream", True):
+                time.sleep(server.token_delay * len(tokens))
+                final.update(response="".join(tokens), eval_duration=int((time.perf_counter() - started) * 1e9))
+                self._send_json(final)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for token in tokens:
+                time.sleep(server.token_delay)
+                self._write_chunk(dict(base, response=token, done=False))
+            final["eval_duration"] = int((time.perf_counter() - started) * 1e9)
+            self._write_chunk(final)
+            self.wfile.write(b"0\r\n\r\n")
+
+    def _example(self, schema, index=0):
+        """A minimal value matching a JSON schema; plain JSON mode gets an empty object."""
+        if not isinstance(schema, dict):
+            return {}
+        if "enum" in schema:
+            return schema["enum"][0]
+        kind = schema.get("type")
+        if kind == "object":
+            return {name: self._example(field, i) for i, (name, field) in enumerate(schema.get("properties", {}).items())}
+        if kind == "array":
+            return []
+        if kind in ("number", "integer"):
+            return 0
+        if kind == "boolean":
+            return False
+        # One sentence of the canned answer per string field, without its "Label: " prefix
+        sentences = re.split(r"(?<=\.)\s+", self.server.response_text.strip())
+        return sentences[index % len(sentences)].split(": ", 1)[-1]
+
+    def _write_chunk(self, payload):
+        line = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+
+class StubOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), latency=0.05, token_delay=0.001, prompt_token_delay=0.0,
+                 parallel=4, response_text=None):
+        super().__init__(address, StubOllamaHandler)
+        self.latency = latency
+        self.token_delay = token_delay
+        self.prompt_token_delay = prompt_token_delay
+        # Mirrors OLLAMA_NUM_PARALLEL: requests beyond this many queue on the server
+        self.slots = threading.BoundedSemaphore(parallel)
+        self.prompt_cache = PrefixTracker(parallel)
+        self.response_text = response_text or (
+            "Income: regular salary deposits of about 4,000.00. Debt: monthly loan payments of 750.00. "
+            "Spending: rent, groceries and dining. Concerning: one large emergency expense of 7,200.00."
+        )
+
+    def embed(self, text):
+        return [((hash(text) >> shift) & 0xFF) / 255.0 for shift in range(0, 64, 8)]
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, name="stub-ollama", daemon=True)
+        thread.start()
+        return self
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Run a stub Ollama server for benchmarks and offline development.")
+    arg_parser.add_argument("--port", type=int, default=11435)
+    arg_parser.add_argument("--latency", type=float, default=0.05, help="Seconds before the first token")
+    arg_parser.add_argument("--token-delay", type=float, default=0.001, help="Seconds per generated token")
+    arg_parser.add_argument("--prompt-token-delay", type=float, default=0.0,
+                            help="Seconds per prompt token not covered by the prompt cache")
+    arg_parser.add_argument("--parallel", type=int, default=4, help="Requests served concurrently")
+    args = arg_parser.parse_args(argv)
+    server = StubOllamaServer(("127.0.0.1", args.port), latency=args.latency,
+                              token_delay=args.token_delay, prompt_token_delay=args.prompt_token_delay,
+                              parallel=args.parallel)
+    print(f"Stub Ollama listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+from anomalies import ANOMALY_COLUMNS, detect_anomalies, format_anomalies, robust_scores
+
+
+def statement(rows, balances=None):
+    """Transaction frame from (date, description, amount) tuples."""
+    frame = pd.DataFrame(rows, columns=["date", "description", "amount"])
+    frame["date"] = pd.to_datetime(frame["date"])
+    frame["balance"] = np.nan if balances is None else balances
+    frame["category"] = None
+    return frame
+
+
+def coffees(count=10):
+    return [(f"2023-01-{day + 1:02d}", "Coffee Shop", -4.0 - day % 3 * 0.5) for day in range(count)]
+
+
+def kinds(anomalies):
+    return set(anomalies["kind"])
+
+
+def test_robust_scores_within_groups():
+    amounts = pd.Series([10.0, 11.0, 9.0, 10.0, 100.0, 5.0, 5.0])
+    groups = pd.Series(["a", "a", "a", "a", "a", "b", "b"])
+    scores = robust_scores(amounts, groups)
+    assert scores[4] > 3.5
+    assert abs(scores[0]) < 1
+    # A group without any spread scores zero rather than dividing by zero
+    assert scores[5] == scores[6] == 0.0
+
+
+def test_large_debit_is_an_outlier_against_its_merchant():
+    anomalies = detect_anomalies(statement(coffees() + [("2023-01-20", "Coffee Shop", -400.0)]))
+    outliers = anomalies[anomalies["kind"] == "outlier"]
+    assert outliers["amount"].tolist() == [-400.0]
+    assert "merchant" in outliers["detail"].iloc[0]
+
+
+def test_regular_spending_is_not_flagged():
+    assert detect_anomalies(statement(coffees())).empty
+
+
+def test_duplicates_fees_gambling_and_cash_advances():
+    anomalies = detect_anomalies(statement([
+        ("2023-01-02", "Netflix", -9.99), ("2023-01-02", "Netflix", -9.99), ("2023-02-02", "Netflix", -9.99),
+        ("2023-01-05", "NSF fee", -35.0),
+        ("2023-01-06", "Bet365 deposit", -50.0),
+        ("2023-01-07", "Payday advance", 300.0),
+    ]))
+    assert kinds(anomalies) == {"duplicate", "nsf_fee", "gambling", "cash_advance"}
+    duplicates = anomalies[anomalies["kind"] == "duplicate"]
+    # The monthly repeat is a subscription, not a duplicate
+    assert duplicates["date"].tolist() == [pd.Timestamp("2023-01-02")]
+    # Flags that are red flags by definition rank first
+    assert anomalies["kind"].iloc[0] == "nsf_fee"
+
+
+def test_balance_drop_into_overdraft():
+    frame = statement([("2023-01-01", "Salary", 1000.0), ("2023-01-02", "Coffee", -5.0), ("2023-01-03", "Car repair", -1100.0)],
+                      balances=[1000.0, 995.0, -105.0])
+    drops = detect_anomalies(frame).query("kind == 'balance_drop'")
+    assert drops["description"].tolist() == ["Car repair"]
+    assert "995.0 -> -105.0" in drops["detail"].iloc[0]
+
+
+def test_empty_statement_has_no_flags():
+    assert list(detect_anomalies(None).columns) == ANOMALY_COLUMNS
+    assert format_anomalies(detect_anomalies(statement([]))) == "Red flags: none detected."
+
+
+def test_format_anomalies_counts_kinds_and_truncates():
+    anomalies = detect_anomalies(statement([(f"2023-01-{day:02d}", "NSF fee", -35.0) for day in range(1, 30, 7)]))
+    text = format_anomalies(anomalies, limit=2)
+    assert text.splitlines()[0] == "Red flags: 5 nsf_fee"
+    assert text.splitlines()[-1] == "- ... and 3 more"
+
+
+def test_cash_advance_names_need_word_boundaries_and_debits():
+    anomalies = detect_anomalies(statement([
+        ("2023-01-02", "Salary earnings ACME", 3000.0), ("2023-01-03", "LEARNING TREE COURSE", -120.0),
+        ("2023-01-04", "BRIGITTE FLOWERS", -25.0), ("2023-01-05", "Earnin transfer", 100.0),
+    ]))
+    assert "cash_advance" not in kinds(anomalies)
+
+
+def test_cash_advance_repayments_and_labelled_advances_are_flagged():
+    anomalies = detect_anomalies(statement([
+        ("2023-01-05", "EARNIN REPAYMENT", -100.0), ("2023-01-06", "Brigit", -9.99),
+        ("2023-01-07", "CASH ADVANCE DEPOSIT", 250.0),
+    ]))
+    assert anomalies.query("kind == 'cash_advance'")["description"].tolist() == [
+        "EARNIN REPAYMENT", "Brigit", "CASH ADVANCE DEPOSIT"]
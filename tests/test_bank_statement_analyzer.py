@@ -0,0 +1,104 @@
+import json
+from concurrent.futures import Future
+
+import pytest
+
+from bank_statement_analyzer import SUMMARY_PROMPT, BankStatementAnalyzer, valid_summary
+from chunking import iter_chunks, token_budget
+from prompts import assemble
+
+GOOD = json.dumps({"income": "Salary of 3,000.00 each month", "debt": "Loan of 500.00", "spending": "Rent 900.00",
+                   "concerns": "None"})
+BAD = json.dumps({"income": "Salary", "debt": "A loan", "spending": "Rent", "concerns": "None"})
+
+
+class DictCache(dict):
+    def set(self, key, value):
+        self[key] = value
+
+
+class FixedRouter:
+    """Router that returns one canned response for every prompt."""
+
+    max_in_flight = 4
+
+    def __init__(self, response):
+        self.response = response
+        self.calls = 0
+
+    def submit(self, route, prompt):
+        self.calls += 1
+        future = Future()
+        future.set_result(self.response)
+        return future
+
+    def invoke_many(self, route, prompts):
+        return [self.submit(route, prompt).result() for prompt in prompts]
+
+
+def analyzer(response):
+    return BankStatementAnalyzer(router=FixedRouter(response), cache=DictCache(), fast_model="small")
+
+
+def test_valid_summary_needs_money_amounts():
+    assert valid_summary(GOOD)
+    assert not valid_summary(BAD)
+    assert not valid_summary("In 2023 the applicant was paid on 2023-01-05 and paid rent monthly.")
+
+
+@pytest.mark.parametrize("call", ["invoke", "submit"])
+def test_responses_that_fail_validation_are_not_cached(call):
+    summarizer = analyzer(BAD)
+    for _ in range(2):
+        if call == "invoke":
+            summarizer.invoke(summarizer.summary_llm, "prompt", "table")
+        else:
+            summarizer.submit(summarizer.summary_llm, "prompt", "table").result()
+    assert summarizer.router.calls == 2
+    assert not summarizer.cache
+
+
+@pytest.mark.parametrize("call", ["invoke", "submit"])
+def test_valid_responses_are_cached(call):
+    summarizer = analyzer(GOOD)
+    for _ in range(2):
+        if call == "invoke":
+            assert summarizer.invoke(summarizer.summary_llm, "prompt", "table") == GOOD
+        else:
+            assert summarizer.submit(summarizer.summary_llm, "prompt", "table").result() == GOOD
+    assert summarizer.router.calls == 1
+
+
+def test_submit_caches_on_the_reading_thread():
+    summarizer = analyzer(GOOD)
+    future = summarizer.submit(summarizer.summary_llm, "prompt", "table")
+    # Nothing is written until the response is read, so the LLM client's loop never does cache I/O
+    assert not summarizer.cache
+    future.result()
+    future.result()
+    assert list(summarizer.cache.values()) == [GOOD]
+
+
+def test_chunks_are_packed_for_the_small_model():
+    summarizer = analyzer(GOOD)
+    budget = summarizer.summary_budget(SUMMARY_PROMPT)
+    chunk = next(iter_chunks([("table0.md", "date,description,amount\n" + "2023-01-01,Coffee,-3.50\n" * 2000)], budget))
+    assert summarizer.summary_llm.tier(assemble(SUMMARY_PROMPT, content=chunk["text"])) == "small"
+
+
+def test_without_a_small_model_chunks_fill_the_context():
+    summarizer = BankStatementAnalyzer(router=FixedRouter(GOOD), fast_model="gemma2:9b")
+    assert summarizer.summary_budget(SUMMARY_PROMPT) == token_budget(summarizer.summary_llm.num_ctx, SUMMARY_PROMPT)
+
+
+def test_reduce_condenses_only_months_with_several_summaries():
+    summarizer = BankStatementAnalyzer(router=FixedRouter(GOOD), fast_model="small", chunk_tokens=5000)
+    long_summary = "Spending on groceries and rent of 1,000.00. " * 40
+    text = "".join(f"File: {month}\n{long_summary}\n\n" for month in ["2023-01", "2023-01", "2023-02", "2023-03"])
+    prompts = []
+    summarizer.router.invoke_many = lambda route, batch: prompts.append(batch) or [GOOD] * len(batch)
+
+    reduced = summarizer.reduce_summaries(text, budget=600)
+    # Level 1 only condenses January's two blocks; level 2 merges the three months in one call
+    assert [len(batch) for batch in prompts] == [1, 1]
+    assert reduced.startswith("File: 2023-01..2023-03\n")
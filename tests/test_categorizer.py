@@ -0,0 +1,95 @@
+import json
+from concurrent.futures import Future
+
+import pandas as pd
+import pytest
+
+from categorizer import TransactionCategorizer
+from metrics import normalize_description
+from model_router import ModelRouter
+from prompts import SEPARATOR
+
+
+class NoLLM:
+    """Client that fails the test if the categorizer asks an LLM."""
+
+    max_in_flight = 1
+
+    def load(self):
+        return 0.0
+
+    def get_model(self, model, **options):
+        return model
+
+    def submit(self, *args, **kwargs):
+        raise AssertionError("rules should have categorized every description")
+
+
+@pytest.fixture
+def rules_only():
+    return TransactionCategorizer(cache_path=None, router=ModelRouter([NoLLM()]), fast_model="small")
+
+
+@pytest.mark.parametrize("description, category", [
+    ("CARD PAYMENT TO TESCO STORES 1234", "Groceries"),
+    ("CARD PAYMENT TO COSTA COFFEE", "Food/Drink"),
+    ("BARCLAYCARD PAYMENT", "Debt Payments"),
+    ("Credit card payment", "Debt Payments"),
+    ("Loan repayment", "Debt Payments"),
+])
+def test_rules_find_the_merchant_behind_payment_method_prefixes(rules_only, description, category):
+    assert rules_only.match_rules(normalize_description([description]))[0] == category
+
+
+class PartialLLM:
+    """Client that categorizes every description but the ones in skip, which only the large model answers unless stubborn."""
+
+    max_in_flight = 1
+
+    def __init__(self, skip=(), stubborn=False):
+        self.skip = set(skip)
+        self.stubborn = stubborn
+        self.asked = []
+
+    def load(self):
+        return 0.0
+
+    def get_model(self, model, **options):
+        return model
+
+    def submit(self, model, prompt, parent=None, schema=None, **attributes):
+        descriptions = prompt.split(SEPARATOR)[-1].splitlines()
+        self.asked.append((model, descriptions))
+        answered = [d for d in descriptions if d not in self.skip or (model == "large" and not self.stubborn)]
+        future = Future()
+        future.set_result(json.dumps({d: "Shopping" for d in answered}))
+        return future
+
+
+def categorizer(client, **kwargs):
+    return TransactionCategorizer(cache_path=None, router=ModelRouter([client]), model="large", fast_model="small",
+                                  **kwargs)
+
+
+def test_partial_answers_re_ask_only_the_missing_descriptions():
+    client = PartialLLM(skip={"gadget hut"})
+    answers = categorizer(client).ask_llm(["widget world", "gadget hut", "doohickey depot"])
+    assert answers == {"widget world": "Shopping", "gadget hut": "Shopping", "doohickey depot": "Shopping"}
+    assert client.asked == [("small", ["widget world", "gadget hut", "doohickey depot"]), ("large", ["gadget hut"])]
+
+
+def test_descriptions_never_answered_are_given_up_after_the_retry_rounds():
+    client = PartialLLM(skip={"gadget hut"}, stubborn=True)
+    answers = categorizer(client, retries=1).ask_llm(["widget world", "gadget hut"])
+    assert answers == {"widget world": "Shopping"}
+    assert client.asked == [("small", ["widget world", "gadget hut"]), ("large", ["gadget hut"])]
+
+
+def test_learned_answers_skip_the_llm_next_time():
+    client = PartialLLM()
+    cat = categorizer(client)
+    cat.ask_llm(["widget world"])
+    frame = pd.DataFrame({"description": ["WIDGET WORLD"], "amount": [-5.0]})
+    assert cat.categorize(frame)["category"].tolist() == ["Shopping"]
+    assert cat.last_stats == {"cache": 1}
+    assert len(client.asked) == 1
@@ -0,0 +1,108 @@
+import json
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from job_queue import RESULT_FILE, STATEMENT_FILE, JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"), str(tmp_path / "jobs"), stale_after=60, max_attempts=2)
+
+
+def stop_heartbeat(queue, job_id, seconds_ago=3600):
+    """Make a running job look abandoned by its worker."""
+    with sqlite3.connect(queue.path) as conn:
+        conn.execute("UPDATE jobs SET heartbeat = heartbeat - ? WHERE id = ?", (seconds_ago, job_id))
+
+
+def test_submit_stores_the_statement(queue):
+    job_id = queue.submit(b"%PDF-1.4", "uploads/statement.pdf", account_id="acct-1")
+    with open(os.path.join(queue.job_dir(job_id), STATEMENT_FILE), "rb") as file:
+        assert file.read() == b"%PDF-1.4"
+    job = queue.get(job_id)
+    assert (job["status"], job["filename"], job["account_id"], job["attempts"]) == ("queued", "statement.pdf", "acct-1", 0)
+
+
+def test_claim_hands_out_the_oldest_job_once(queue):
+    first = queue.submit(b"1", "a.pdf")
+    second = queue.submit(b"2", "b.pdf")
+    claimed = queue.claim("worker-1")
+    assert claimed["id"] == first
+    assert (claimed["status"], claimed["worker"], claimed["attempts"]) == ("running", "worker-1", 1)
+    assert queue.claim("worker-2")["id"] == second
+    assert queue.claim("worker-3") is None
+
+
+def test_concurrent_claims_never_share_a_job(queue):
+    job_ids = {queue.submit(b"x", f"{i}.pdf") for i in range(20)}
+    claimed = []
+    lock = threading.Lock()
+
+    def work(name):
+        while True:
+            job = queue.claim(name)
+            if job is None:
+                return
+            with lock:
+                claimed.append(job["id"])
+
+    threads = [threading.Thread(target=work, args=(f"worker-{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == sorted(job_ids)
+
+
+def test_stale_job_is_requeued_then_failed_after_max_attempts(queue):
+    job_id = queue.submit(b"x", "a.pdf")
+    queue.claim("worker-1")
+    queue.update_stage(job_id, "parse")
+    stop_heartbeat(queue, job_id)
+
+    retried = queue.claim("worker-2")
+    assert (retried["id"], retried["worker"], retried["attempts"]) == (job_id, "worker-2", 2)
+    # A retry starts its stage progress over
+    assert retried["stages"] == {}
+
+    stop_heartbeat(queue, job_id)
+    assert queue.claim("worker-3") is None
+    job = queue.get(job_id)
+    assert (job["status"], job["error"]) == ("failed", "worker stopped responding")
+
+
+def test_heartbeating_job_is_not_requeued(queue):
+    job_id = queue.submit(b"x", "a.pdf")
+    queue.claim("worker-1")
+    queue.heartbeat(job_id)
+    assert queue.claim("worker-2") is None
+    assert queue.get(job_id)["worker"] == "worker-1"
+
+
+def test_stages_complete_and_load_result(queue):
+    job_id = queue.submit(b"x", "a.pdf")
+    queue.claim("worker-1")
+    queue.update_stage(job_id, "parse")
+    queue.update_stage(job_id, "parse", "done", tables=3)
+    queue.complete(job_id, {"tables": ["table0.md"], "transactions_sha256": "abc"})
+
+    job = queue.get(job_id)
+    assert job["status"] == "done"
+    assert job["stages"]["parse"]["status"] == "done"
+    assert job["stages"]["parse"]["tables"] == 3
+    result = queue.load_result(job_id)
+    assert result["table_paths"] == [os.path.join(queue.job_dir(job_id), "tables", "table0.md")]
+    assert result["transactions_hash"] == "abc"
+    with open(os.path.join(queue.job_dir(job_id), RESULT_FILE), encoding="utf-8") as file:
+        assert json.load(file)["tables"] == ["table0.md"]
+
+
+def test_unfinished_job_has_no_result(queue):
+    job_id = queue.submit(b"x", "a.pdf")
+    assert queue.load_result(job_id) is None
+    queue.fail(job_id, "boom")
+    assert queue.get(job_id)["error"] == "boom"
@@ -0,0 +1,48 @@
+import os
+
+import pandas as pd
+
+import job_worker
+from account_store import AccountStore
+from job_queue import JobQueue
+from result_cache import hash_file
+from transactions import TRANSACTION_COLUMNS, load_transactions
+
+
+class NoParser:
+    def __init__(self, **kwargs):
+        pass
+
+    def parse_statement(self, file_path, tables_dir):
+        raise AssertionError("a statement already in the account history was parsed again")
+
+
+class FakeAnalyzer:
+    def __init__(self, **kwargs):
+        self.chunk_stats = []
+        self.red_flags = ""
+
+    def assess_account(self, store, account_id, output_file):
+        return f"{len(store.load_transactions(account_id))} transactions"
+
+
+def test_known_statement_skips_parse_and_history(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_worker, "BankStatementParser", NoParser)
+    monkeypatch.setattr(job_worker, "BankStatementAnalyzer", FakeAnalyzer)
+    queue = JobQueue(str(tmp_path / "jobs.db"), str(tmp_path / "jobs"))
+    store = AccountStore(str(tmp_path / "accounts.db"))
+    job_id = queue.submit(b"%PDF-1.4", "statement.pdf", account_id="acct-1")
+    history = pd.DataFrame({"date": pd.to_datetime(["2023-01-02", "2023-01-05"]), "description": ["Salary", "Rent"],
+                            "amount": [3000.0, -900.0], "balance": [3000.0, 2100.0], "direction": ["credit", "debit"],
+                            "category": [None, None], "table": [0, 0]})[TRANSACTION_COLUMNS]
+    store.add_statement("acct-1", hash_file(os.path.join(queue.job_dir(job_id), job_worker.STATEMENT_FILE)), history)
+
+    worker = job_worker.JobWorker(queue, api_key="", store=store)
+    result = worker.process(queue.claim("worker-1"))
+    assert result["final_summary"] == "2 transactions"
+    assert result["tables"] == []
+    stages = queue.get(job_id)["stages"]
+    assert stages["parse"]["skipped"] is True
+    assert stages["history"]["changed_months"] == 0
+    transactions_path = os.path.join(queue.job_dir(job_id), "tables", job_worker.TRANSACTIONS_FILE)
+    assert load_transactions(transactions_path)["description"].tolist() == ["Salary", "Rent"]
@@ -0,0 +1,55 @@
+import pytest
+
+from local_extractor import extract_local, score_table, trim_table
+from transactions import build_transaction_frame
+
+
+def test_trim_table_starts_at_the_header_and_drops_blank_rows():
+    rows = [["2", "", "", ""], ["", "", "", ""], ["Date", "Description", "Amount", "Category"], [None, None, None, None],
+            ["2023-03-20", "Refund", "5455.33", "Deposits"], ["", "", "", ""], ["2023-03-21", "Rent", "-900.00", "Fixed"]]
+    assert trim_table(rows) == [["Date", "Description", "Amount", "Category"],
+                                ["2023-03-20", "Refund", "5455.33", "Deposits"], ["2023-03-21", "Rent", "-900.00", "Fixed"]]
+
+
+def test_trim_table_without_a_known_header_starts_above_the_first_transaction():
+    rows = [["Statement page 2", "", ""], ["When", "What", "How much"], ["2023-03-20", "Refund", "5455.33"]]
+    assert trim_table(rows)[0] == ["When", "What", "How much"]
+
+
+def test_score_table_scores_clean_transaction_tables_high():
+    is_transactions, confidence = score_table(trim_table([["Date", "Description", "Amount"],
+                                                          ["2023-01-02", "Salary", "3000.00"],
+                                                          ["2023-01-05", "Rent", "-900.00"]]))
+    assert is_transactions
+    assert confidence > 0.9
+
+
+def test_score_table_sends_tables_with_unmapped_headers_to_llamaparse():
+    assert score_table(trim_table([["When", "What", "How much"], ["2023-03-20", "Refund", "5455.33"]])) == (True, 0.0)
+
+
+def test_score_table_keeps_tables_without_transactions():
+    assert score_table(trim_table([["Account", "Number"], ["Current", "1234"]])) == (False, 1.0)
+
+
+@pytest.mark.parametrize("layout", ["grid", "plain", "split"])
+def test_every_generated_row_is_extracted(tmp_path, layout):
+    generate_data = pytest.importorskip("generate_data")
+    parser = pytest.importorskip("bank_statement_parser")
+    df = generate_data.transaction_frame(generate_data.generate_transactions(20, months=2, seed=1))
+    path = str(tmp_path / f"{layout}.pdf")
+    generate_data.generate_pdf(df, path, layout)
+    pages = extract_local(path, max_workers=1)
+    # Every page must stay local, as the parser would keep it
+    assert all(page["confidence"] >= parser.MIN_CONFIDENCE for page in pages)
+    frame = build_transaction_frame([table for page in pages for table in page["tables"]])
+    assert len(frame) == len(df)
+
+
+def test_rows_that_cannot_be_typed_send_the_page_to_llamaparse(tmp_path):
+    platypus = pytest.importorskip("reportlab.platypus")
+    path = str(tmp_path / "no-year.pdf")
+    rows = [["Date", "Description", "Debit", "Credit", "Balance"]]
+    rows += [[f"{day:02d} Dec", "Coffee shop", "3.00", "", f"{100 - 3 * day:.2f}"] for day in range(1, 20)]
+    platypus.SimpleDocTemplate(path).build([platypus.Table(rows)])
+    assert extract_local(path, max_workers=1)[0]["confidence"] == 0.0
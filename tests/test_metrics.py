@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from metrics import category_totals, compute_metrics, dti_band, format_fact_sheet, normalize_description, recurring_payments
+
+
+def statement(rows):
+    """Transaction frame from (date, description, amount, balance) tuples."""
+    frame = pd.DataFrame(rows, columns=["date", "description", "amount", "balance"])
+    frame["date"] = pd.to_datetime(frame["date"])
+    frame["category"] = None
+    return frame
+
+
+@pytest.fixture
+def three_months():
+    rows = []
+    balance = 0.0
+    for month in ("01", "02", "03"):
+        for day, description, amount in [("01", "Salary ACME", 3000.0), ("05", "Rent", -1000.0),
+                                         ("15", "Loan Payment #" + month, -500.0)]:
+            balance += amount
+            rows.append((f"2023-{month}-{day}", description, amount, balance))
+    rows.append(("2023-02-20", "NSF fee", -35.0, balance - 35.0))
+    rows.append(("2023-03-20", "Refund from shop", 100.0, -50.0))
+    return statement(rows)
+
+
+def test_compute_metrics_income_debt_and_savings(three_months):
+    metrics = compute_metrics(three_months)
+    assert metrics["period_start"] == "2023-01-01"
+    assert metrics["period_end"] == "2023-03-20"
+    assert metrics["months"] == 3
+    assert metrics["transactions"] == 11
+    # Refunds are credits but not income
+    assert metrics["monthly_income"] == {"2023-01": 3000.0, "2023-02": 3000.0, "2023-03": 3000.0}
+    assert metrics["income_cv"] == 0.0
+    assert metrics["months_without_income"] == 0
+    assert metrics["total_debt_payments"] == 1500.0
+    assert metrics["average_monthly_debt_payments"] == 500.0
+    assert metrics["dti_percent"] == 16.7
+    assert metrics["average_monthly_spending"] == pytest.approx(1511.67)
+    assert metrics["savings_rate_percent"] == 49.6
+
+
+def test_compute_metrics_balances_fees_and_recurring(three_months):
+    metrics = compute_metrics(three_months)
+    assert metrics["negative_balance_events"] == 1
+    assert metrics["lowest_balance"] == -50.0
+    assert metrics["overdraft_fee_events"] == 1
+    assert metrics["overdraft_fee_total"] == 35.0
+    assert [item["payee"] for item in metrics["recurring_payments"]] == ["rent", "loan payment"]
+
+
+def test_compute_metrics_without_income_or_balances():
+    metrics = compute_metrics(statement([("2023-01-02", "Coffee", -3.5, np.nan), ("2023-02-02", "Coffee", -3.5, np.nan)]))
+    assert metrics["dti_percent"] is None
+    assert metrics["savings_rate_percent"] is None
+    assert metrics["months_without_income"] == 2
+    assert metrics["lowest_balance"] is None
+
+
+def test_compute_metrics_of_empty_frame():
+    assert compute_metrics(None) == {}
+    assert format_fact_sheet({}) == "No structured transaction data was available."
+
+
+def test_recurring_payments_ignore_unstable_amounts():
+    frame = statement([(f"2023-0{month}-10", "Gym", amount, np.nan)
+                       for month, amount in [(1, -30.0), (2, -30.0), (3, -31.0), (4, -30.0)]]
+                      + [(f"2023-0{month}-12", "Amazon", amount, np.nan)
+                         for month, amount in [(1, -5.0), (2, -300.0), (3, -40.0)]])
+    assert recurring_payments(frame)["payee"].tolist() == ["gym"]
+
+
+def test_category_totals_exclude_income():
+    frame = statement([("2023-01-01", "Salary", 100.0, np.nan), ("2023-01-02", "Shop", -20.0, np.nan),
+                       ("2023-01-03", "Shop", -5.0, np.nan), ("2023-01-04", "Bus", -2.0, np.nan)])
+    frame["category"] = ["Deposits", "Shopping", "Shopping", "Transportation"]
+    assert category_totals(frame).to_dict() == {"Shopping": 25.0, "Transportation": 2.0}
+
+
+def test_normalize_description_groups_payees():
+    assert normalize_description(["TESCO #1234", "Tesco-5678", None]).tolist() == ["tesco", "tesco", ""]
+
+
+@pytest.mark.parametrize("dti, band", [(None, "unknown"), (10, "excellent"), (35, "manageable"), (40, "risky")])
+def test_dti_band(dti, band):
+    assert dti_band(dti) == band
+
+
+def test_format_fact_sheet_mentions_key_figures(three_months):
+    sheet = format_fact_sheet(compute_metrics(three_months))
+    assert "DTI: 16.70% (excellent)" in sheet
+    assert "Overdraft/NSF fees: 1 totalling 35.00" in sheet
+
+
+def test_debit_card_purchases_are_not_debt():
+    metrics = compute_metrics(statement([
+        ("2023-01-01", "Salary", 3000.0, np.nan), ("2023-01-02", "CARD PAYMENT TO TESCO STORES", -80.0, np.nan),
+        ("2023-01-03", "CARD PAYMENT TO COSTA COFFEE", -12.5, np.nan), ("2023-01-15", "Loan repayment", -200.0, np.nan),
+        ("2023-01-20", "BARCLAYCARD PAYMENT", -100.0, np.nan),
+    ]))
+    assert metrics["total_debt_payments"] == 300.0
+
+
+def test_no_fees_render_as_zero():
+    metrics = compute_metrics(statement([("2023-01-01", "Salary", 3000.0, np.nan)]))
+    assert metrics["overdraft_fee_total"] == 0.0
+    assert "Overdraft/NSF fees: 0 totalling 0.00" in format_fact_sheet(metrics)
@@ -0,0 +1,84 @@
+import json
+from concurrent.futures import Future
+
+import pytest
+
+from model_router import ModelRouter, Route
+
+SCHEMA = {"type": "object", "properties": {"ok": {"type": "boolean"}}, "required": ["ok"]}
+GOOD = json.dumps({"ok": True})
+BAD = "not json"
+
+
+class ScriptedClient:
+    """Client that answers each model from its own list of responses and records every call."""
+
+    max_in_flight = 4
+
+    def __init__(self, responses):
+        self.responses = {model: list(answers) for model, answers in responses.items()}
+        self.calls = []
+
+    def load(self):
+        return 0.0
+
+    def get_model(self, model, **options):
+        return model
+
+    def submit(self, model, prompt, parent=None, schema=None, **attributes):
+        self.calls.append((model, attributes))
+        future = Future()
+        response = self.responses[model].pop(0)
+        if isinstance(response, Exception):
+            future.set_exception(response)
+        else:
+            future.set_result(response)
+        return future
+
+
+def route(**kwargs):
+    return Route("test", "large", "small", schema=SCHEMA, **kwargs)
+
+
+def test_valid_small_answer_is_not_escalated():
+    client = ScriptedClient({"small": [GOOD]})
+    assert ModelRouter([client]).submit(route(), "short prompt").result() == GOOD
+    assert [model for model, _ in client.calls] == ["small"]
+
+
+def test_bad_small_answer_escalates_to_the_large_model():
+    client = ScriptedClient({"small": [BAD], "large": [GOOD]})
+    assert ModelRouter([client]).submit(route(), "short prompt").result() == GOOD
+    assert client.calls == [("small", {"route": "test", "tier": "small"}),
+                            ("large", {"route": "test", "tier": "large", "escalated": True})]
+
+
+def test_long_prompts_start_on_the_large_model():
+    client = ScriptedClient({"large": [GOOD]})
+    ModelRouter([client]).submit(route(small_tokens=5), "word " * 100).result()
+    assert [model for model, _ in client.calls] == ["large"]
+
+
+def test_large_model_is_retried_once_then_its_last_answer_returned():
+    client = ScriptedClient({"large": [BAD, "still not json", GOOD]})
+    assert ModelRouter([client]).submit(route(), "prompt", tier="large").result() == "still not json"
+    assert [attributes.get("retried", False) for _, attributes in client.calls] == [False, True]
+
+
+def test_validate_judges_responses_without_schema_enforcement():
+    client = ScriptedClient({"small": ['{"ok": "yes"}']})
+    lenient = route(enforce_schema=False, validate=lambda text: "ok" in text)
+    assert ModelRouter([client]).submit(lenient, "prompt").result() == '{"ok": "yes"}'
+
+
+def test_errors_escalate_but_are_not_retried():
+    error = ConnectionError("endpoint down")
+    client = ScriptedClient({"small": [error], "large": [ConnectionError("still down")]})
+    with pytest.raises(ConnectionError, match="still down"):
+        ModelRouter([client]).submit(route(), "prompt").result()
+    assert [model for model, _ in client.calls] == ["small", "large"]
+
+
+def test_invoke_many_keeps_prompt_order():
+    client = ScriptedClient({"small": [GOOD, BAD], "large": [json.dumps({"ok": False})]})
+    assert ModelRouter([client]).invoke_many(route(), ["a", "b"]) == [GOOD, json.dumps({"ok": False})]
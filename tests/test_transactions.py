@@ -0,0 +1,139 @@
+import math
+import warnings
+
+import pandas as pd
+import pytest
+
+from transactions import (TransactionWriter, build_transaction_frame, coerce_amounts, coerce_dates, normalize_table,
+                          parse_markdown_table, split_markdown_row)
+
+
+def test_parse_markdown_table_reads_header_and_rows():
+    frame = parse_markdown_table("| Date | Description | Amount |\n|---|---|---|\n| 2023-01-02 | Salary | 3,400.00 |")
+    assert list(frame.columns) == ["Date", "Description", "Amount"]
+    assert frame.values.tolist() == [["2023-01-02", "Salary", "3,400.00"]]
+
+
+def test_parse_markdown_table_pads_short_rows():
+    frame = parse_markdown_table("| Date | Description | Amount |\n|---|---|---|\n| 2023-01-02 | Salary |")
+    assert frame.values.tolist() == [["2023-01-02", "Salary", ""]]
+
+
+def test_parse_markdown_table_merges_surplus_cells_into_description():
+    frame = parse_markdown_table("| Date | Description | Amount |\n|---|---|---|\n| 2023-01-02 | A | B | -5.00 |")
+    assert frame.values.tolist() == [["2023-01-02", "A | B", "-5.00"]]
+
+
+def test_parse_markdown_table_never_merges_into_numeric_columns():
+    frame = parse_markdown_table("| Date | Amount |\n|---|---|\n| 2023-01-01 | 1 | 2 |\n| 2023-01-02 | 5.00 |")
+    assert frame.values.tolist() == [["2023-01-02", "5.00"]]
+    assert frame.attrs["unparsed_rows"] == 1
+
+
+def test_parse_markdown_table_keeps_escaped_pipes():
+    assert split_markdown_row(r"| 2023-01-02 | A \| B | 1.00 |") == ["2023-01-02", "A | B", "1.00"]
+
+
+def test_parse_markdown_table_skips_repeated_headers_but_keeps_dash_rows():
+    table = "\n".join([
+        "| Date | Amount |", "|---|---|", "| 2023-01-02 | 5.00 |", "| - | - |",
+        "| Date | Amount |", "|---|---|", "| 2023-01-03 | 7.00 |",
+    ])
+    frame = parse_markdown_table(table)
+    assert frame.values.tolist() == [["2023-01-02", "5.00"], ["-", "-"], ["2023-01-03", "7.00"]]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1,234.56", 1234.56),
+    ("-12.50", -12.5),
+    ("12.50-", -12.5),
+    ("(40.00)", -40.0),
+    ("$99.99", 99.99),
+    ("£1,000.00 DR", -1000.0),
+    ("250.00 CR", 250.0),
+])
+def test_coerce_amounts(text, expected):
+    assert coerce_amounts([text])[0] == pytest.approx(expected)
+
+
+def test_coerce_amounts_leaves_unparseable_cells_nan():
+    amounts = coerce_amounts(["", "n/a", None])
+    assert all(math.isnan(value) for value in amounts)
+
+
+def test_coerce_dates_parses_iso_dates_without_warnings():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        dates = coerce_dates(["2023-01-31", "2023-02-01", ""])
+    assert dates.tolist()[:2] == [pd.Timestamp("2023-01-31"), pd.Timestamp("2023-02-01")]
+    assert pd.isna(dates[2])
+
+
+def test_coerce_dates_picks_day_first_when_it_parses_more():
+    dates = coerce_dates(["31/01/2023", "05/02/2023"])
+    assert dates.tolist() == [pd.Timestamp("2023-01-31"), pd.Timestamp("2023-02-05")]
+
+
+def test_coerce_dates_picks_month_first_when_it_parses_more():
+    dates = coerce_dates(["01/31/2023", "02/05/2023"])
+    assert dates.tolist() == [pd.Timestamp("2023-01-31"), pd.Timestamp("2023-02-05")]
+
+
+def test_normalize_table_signs_debit_and_credit_columns():
+    table = parse_markdown_table("\n".join([
+        "| Date | Details | Money out | Money in | Balance |", "|---|---|---|---|---|",
+        "| 2023-01-02 | Salary | | 3,000.00 | 3,000.00 |",
+        "| 2023-01-03 | Rent | 1,200.00 | | 1,800.00 |",
+    ]))
+    frame = normalize_table(table, table_index=4)
+    assert frame["amount"].tolist() == [3000.0, -1200.0]
+    assert frame["direction"].tolist() == ["credit", "debit"]
+    assert frame["balance"].tolist() == [3000.0, 1800.0]
+    assert frame["description"].tolist() == ["Salary", "Rent"]
+    assert set(frame["table"]) == {4}
+
+
+def test_normalize_table_drops_rows_without_date_or_amount():
+    table = parse_markdown_table("\n".join([
+        "| Date | Description | Amount |", "|---|---|---|",
+        "| 2023-01-02 | Salary | 10.00 |", "| Opening balance | | |", "| 2023-01-03 | Fee | - |",
+    ]))
+    assert normalize_table(table)["description"].tolist() == ["Salary"]
+
+
+def test_normalize_table_rejects_tables_without_transaction_columns():
+    assert normalize_table(parse_markdown_table("| Account | Number |\n|---|---|\n| Current | 1234 |")) is None
+
+
+def test_build_transaction_frame_numbers_tables_and_counts_unparsed_rows():
+    tables = [
+        "| Date | Amount |\n|---|---|\n| 2023-01-02 | 5.00 |\n| 2023-01-03 | 1 | 2 |",
+        "| Summary |\n|---|\n| nothing here |",
+        "| Date | Amount |\n|---|---|\n| 2023-01-04 | -7.00 |",
+    ]
+    frame = build_transaction_frame(tables, start_index=10)
+    assert frame["table"].tolist() == [10, 12]
+    assert frame["amount"].tolist() == [5.0, -7.0]
+    assert frame.attrs["unparsed_rows"] == 1
+
+
+def test_build_transaction_frame_without_transactions_is_typed_and_empty():
+    frame = build_transaction_frame(["| Summary |\n|---|\n| none |"])
+    assert frame.empty
+    assert str(frame["amount"].dtype) == "float64"
+
+
+def test_coerce_dates_rejects_dates_without_a_year():
+    dates = coerce_dates(["01 Dec", "15 Dec", "2023-01-31"])
+    assert pd.isna(dates[0]) and pd.isna(dates[1])
+    assert dates[2] == pd.Timestamp("2023-01-31")
+    assert str(dates.dtype) == "datetime64[ns]"
+
+
+def test_tables_without_years_can_still_be_written(tmp_path):
+    table = "\n".join(["| Date | Description | Debit | Credit | Balance |", "|---|---|---|---|---|",
+                       "| 01 Dec | Coffee | 3.00 | | 100.00 |"])
+    frame = build_transaction_frame([table])
+    with TransactionWriter(str(tmp_path / "transactions.parquet")) as writer:
+        writer.append(frame)
+    assert frame.empty
@@ -0,0 +1,205 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """Records nested, timed spans for each pipeline stage.
+
+    Finished spans are kept in memory and, when path is set, appended to a
+    JSON-lines file so timings can be aggregated across runs and processes.
+    Once the file passes max_bytes it is moved to path + ".1", replacing the
+    previous one, so at most two files' worth of spans are kept on disk.
+    """
+
+    def __init__(self, path=None, max_spans=10000, max_bytes=None):
+        self.path = path
+        self.max_bytes = max_bytes or int(os.environ.get("TRACE_FILE_MAX_BYTES", 20 * 2**20))
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def current(self):
+        return _current_span.get()
+
+    @contextmanager
+    def span(self, name, parent=None, **attributes):
+        """Time a block as a child of parent (or of the active span in this context)."""
+        parent = parent or _current_span.get()
+        span = {
+            "trace_id": parent["trace_id"] if parent else uuid.uuid4().hex,
+            "span_id": uuid.uuid4().hex[:16],
+            "parent_id": parent["span_id"] if parent else None,
+            "name": name,
+            "start": time.time(),
+            "duration": None,
+            "status": "ok",
+            "attributes": dict(attributes),
+        }
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span["status"] = "error"
+            span["attributes"]["error"] = repr(e)
+            raise
+        finally:
+            span["duration"] = time.perf_counter() - started
+            _current_span.reset(token)
+            self._record(span)
+
+    def _record(self, span):
+        with self._lock:
+            self.spans.append(span)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as file:
+                    file.write(json.dumps(span, default=str) + "\n")
+                    size = file.tell()
+                if size > self.max_bytes:
+                    try:
+                        os.replace(self.path, f"{self.path}.1")
+                    except OSError:
+                        # Another process sharing the file rotated it first
+                        pass
+
+    def trace(self, trace_id):
+        return [span for span in list(self.spans) if span["trace_id"] == trace_id]
+
+
+def traced(name):
+    """Decorator that wraps every call of a function in a span."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_llm_usage(span, generation_info, elapsed=None):
+    """Copy Ollama's token counters from a generation's final chunk onto a span."""
+    prompt_tokens = generation_info.get("prompt_eval_count")
+    response_tokens = generation_info.get("eval_count")
+    eval_seconds = (generation_info.get("eval_duration") or 0) / 1e9 or elapsed
+    span["attributes"].update({
+        "prompt_tokens": prompt_tokens,
+        "response_tokens": response_tokens,
+        "tokens_per_sec": round(response_tokens / eval_seconds, 2) if response_tokens and eval_seconds else None,
+    })
+
+
+def prefix_hit_rate(spans):
+    """Estimated share of prompt tokens that LLM calls could serve from Ollama's prompt cache, or None without calls.
+
+    The estimate comes from each client's PrefixTracker, which only sees its
+    own process's requests and counts about four characters per token, so it
+    overstates reuse when other processes share the server.
+    """
+    llm_spans = [span for span in spans if span["name"] in ("llm_call", "llm_stream")]
+    input_tokens = sum(span["attributes"].get("input_tokens") or 0 for span in llm_spans)
+    prefix_tokens = sum(span["attributes"].get("prefix_tokens") or 0 for span in llm_spans)
+    return prefix_tokens / input_tokens if input_tokens else None
+
+
+def model_latency(spans):
+    """Per model and tier: LLM call count and p50/p95 latency in seconds."""
+    llm_spans = [span for span in spans if span["name"] in ("llm_call", "llm_stream")]
+    if not llm_spans:
+        return pd.DataFrame()
+    frame = pd.DataFrame({
+        "model": [span["attributes"].get("model") for span in llm_spans],
+        "tier": [span["attributes"].get("tier") or "-" for span in llm_spans],
+        "seconds": [span["duration"] for span in llm_spans],
+    })
+    grouped = frame.groupby(["model", "tier"])["seconds"]
+    stats = grouped.describe(percentiles=[0.5, 0.95]).rename(columns={"50%": "p50", "95%": "p95"})
+    return stats[["count", "mean", "p50", "p95", "max"]].round(3)
+
+
+def escalation_rate(spans):
+    """Share of small-tier LLM calls whose answer was redone by the large model, or None without any."""
+    small_calls = sum(1 for span in spans if span["name"] == "llm_call" and span["attributes"].get("tier") == "small")
+    escalations = sum(1 for span in spans if span["name"] == "llm_escalation")
+    return escalations / small_calls if small_calls else None
+
+
+def to_otel(spans):
+    """Convert spans to OpenTelemetry's JSON span shape."""
+    def attribute(key, value):
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    return {"resourceSpans": [{
+        "resource": {"attributes": [attribute("service.name", "bank-statement-analyzer")]},
+        "scopeSpans": [{"scope": {"name": "tracing"}, "spans": [{
+            "traceId": span["trace_id"],
+            "spanId": span["span_id"],
+            "parentSpanId": span["parent_id"] or "",
+            "name": span["name"],
+            "startTimeUnixNano": str(int(span["start"] * 1e9)),
+            "endTimeUnixNano": str(int((span["start"] + span["duration"]) * 1e9)),
+            "status": {"code": 2 if span["status"] == "error" else 1},
+            "attributes": [attribute(key, value) for key, value in span["attributes"].items() if value is not None],
+        } for span in spans]}],
+    }]}
+
+
+def load_spans(path, limit=20000, chunk_size=2**20):
+    """The last limit spans in path, reading the file backwards so only its tail is parsed."""
+    if not path or not os.path.exists(path):
+        return []
+    lines = []
+    with open(path, "rb") as file:
+        position = file.seek(0, os.SEEK_END)
+        tail = b""
+        while position > 0 and len(lines) <= limit:
+            step = min(chunk_size, position)
+            position -= step
+            file.seek(position)
+            parts = (file.read(step) + tail).split(b"\n")
+            # The first part may be cut off mid-line; keep it for the next chunk
+            tail = parts.pop(0) if position > 0 else b""
+            lines[:0] = [line for line in parts if line.strip()]
+    spans = []
+    for line in lines[-limit:]:
+        try:
+            spans.append(json.loads(line))
+        except ValueError:
+            continue
+    return spans
+
+
+def stage_percentiles(spans):
+    """Per-stage count, mean and p50/p90/p99 wall time in seconds, plus mean LLM throughput."""
+    if not spans:
+        return pd.DataFrame()
+    frame = pd.DataFrame({
+        "stage": [span["name"] for span in spans],
+        "seconds": [span["duration"] for span in spans],
+        "tokens_per_sec": [span["attributes"].get("tokens_per_sec") for span in spans],
+    })
+    frame["tokens_per_sec"] = pd.to_numeric(frame["tokens_per_sec"], errors="coerce")
+    grouped = frame.groupby("stage")
+    stats = grouped["seconds"].describe(percentiles=[0.5, 0.9, 0.99])
+    stats = stats.rename(columns={"50%": "p50", "90%": "p90", "99%": "p99"})[["count", "mean", "p50", "p90", "p99", "max"]]
+    stats["tokens_per_sec"] = grouped["tokens_per_sec"].mean()
+    return stats.round(3).sort_values("mean", ascending=False)
+
+
+tracer = Tracer(os.environ.get("TRACE_FILE", "traces.jsonl"))
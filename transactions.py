@@ -0,0 +1,302 @@
+import re
+import warnings
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+TRANSACTIONS_FILE = "transactions.parquet"
+TRANSACTION_COLUMNS = ["date", "description", "amount", "balance", "direction", "category", "table"]
+TRANSACTION_SCHEMA = pa.schema([
+    ("date", pa.timestamp("ns")), ("description", pa.string()), ("amount", pa.float64()),
+    ("balance", pa.float64()), ("direction", pa.string()), ("category", pa.string()), ("table", pa.int64()),
+])
+
+# Header names seen on common statement layouts, matched case-insensitively
+COLUMN_ALIASES = {
+    "date": ["date", "transaction date", "posting date", "posted date", "value date", "txn date"],
+    "description": ["description", "details", "transaction details", "narration", "particulars",
+                    "memo", "payee", "merchant", "reference"],
+    "amount": ["amount", "transaction amount", "amount (£)", "amount ($)", "value"],
+    "debit": ["debit", "debits", "withdrawal", "withdrawals", "money out", "paid out", "dr"],
+    "credit": ["credit", "credits", "deposit", "deposits", "money in", "paid in", "cr"],
+    "balance": ["balance", "running balance", "closing balance", "available balance"],
+    "category": ["category"],
+}
+
+# Earliest year accepted as a transaction date; a date without a year parses as year 1
+MIN_DATE_YEAR = 1970
+_CURRENCY_NOISE = re.compile(r"[^\d.\-]")
+_DR_SUFFIX = re.compile(r"(?<![a-z])(dr|cr)\.?$", re.IGNORECASE)
+_CELL_SEPARATOR = re.compile(r"(?<!\\)\|")
+_SEPARATOR_ROW = re.compile(r"^\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?$")
+
+
+def extract_tables_from_markdown(markdown_content):
+    tables = []
+    lines = markdown_content.split('\n')
+    table = []
+    in_table = False
+
+    for line in lines:
+        if line.strip().startswith('|') and line.strip().endswith('|'):
+            if not in_table:
+                in_table = True
+            table.append(line)
+        else:
+            if in_table:
+                tables.append('\n'.join(table))
+                table = []
+                in_table = False
+
+    if in_table:
+        tables.append('\n'.join(table))
+
+    return tables
+
+
+def split_markdown_row(line):
+    """Cells of one markdown table row; escaped pipes (\\|) stay inside their cell."""
+    cells = _CELL_SEPARATOR.split(line.strip().removeprefix('|').removesuffix('|'))
+    return [cell.strip().replace('\\|', '|') for cell in cells]
+
+
+def parse_markdown_table(markdown_text):
+    """Parse a markdown table into a frame of strings, keeping every row it can place.
+
+    Rows with missing cells are padded with empty strings. Rows with extra
+    cells, usually a description containing a pipe, have the surplus joined
+    back into the description column, or another text column. When the table
+    has no text column such rows are left out rather than gluing numbers
+    together, and counted in the frame's attrs["unparsed_rows"].
+    """
+    lines = [line for line in markdown_text.strip().split('\n') if line.strip()]
+    headers = split_markdown_row(lines[0])
+    width = len(headers)
+    merge_at = _text_column(headers)
+
+    data = []
+    unparsed = 0
+    after_header = True
+    for line in lines[1:]:
+        cells = split_markdown_row(line)
+        if after_header and _SEPARATOR_ROW.match(line.strip()):
+            # The header's separator; anywhere else a row of dashes is data with placeholder cells
+            after_header = False
+            continue
+        # A header repeated where the table continues on a new page, which may bring its own separator
+        after_header = cells == headers
+        if after_header:
+            continue
+        if len(cells) > width:
+            if merge_at is None:
+                unparsed += 1
+                continue
+            extra = len(cells) - width
+            cells[merge_at:merge_at + extra + 1] = [" | ".join(cells[merge_at:merge_at + extra + 1])]
+        data.append(cells + [""] * (width - len(cells)))
+    frame = pd.DataFrame(data, columns=headers)
+    frame.attrs["unparsed_rows"] = unparsed
+    return frame
+
+
+def _text_column(headers):
+    """Position of the column surplus cells belong to: the description, else the last non-numeric column."""
+    matched = match_columns(headers)
+    if "description" in matched:
+        return headers.index(matched["description"])
+    structured = {matched[field] for field in ("date", "amount", "debit", "credit", "balance") if field in matched}
+    text = [i for i, header in enumerate(headers) if header not in structured]
+    return text[-1] if text else None
+
+
+def coerce_amounts(values):
+    """Convert statement amount strings to signed floats.
+
+    Handles currency symbols, thousands separators, parenthesized negatives,
+    leading/trailing minus signs and CR/DR suffixes. Unparseable cells become NaN.
+    """
+    text = pd.Series(values, dtype="object").fillna("").astype(str).str.strip()
+    suffix = text.str.extract(_DR_SUFFIX, expand=False).str.lower()
+    text = text.str.replace(_DR_SUFFIX, "", regex=True).str.strip()
+
+    negative = (
+        (text.str.startswith("(") & text.str.endswith(")"))
+        | text.str.endswith("-")
+        | text.str.contains(r"^[^\d]*-", regex=True)
+        | (suffix == "dr")
+    )
+    digits = text.str.replace(_CURRENCY_NOISE, "", regex=True).str.replace("-", "", regex=False)
+    amounts = pd.to_numeric(digits, errors="coerce").abs()
+    return pd.Series(np.where(negative, -amounts, amounts), index=text.index, dtype="float64")
+
+
+def coerce_dates(values):
+    """Parse date strings with one vectorized pass per candidate format.
+
+    ISO dates (2023-01-31), which most extracted tables use, are parsed
+    first. For the rest, month-first and day-first readings are both tried
+    over the remaining cells and the one that parses more wins; leftovers
+    are parsed element-wise. Dates before MIN_DATE_YEAR, such as "01 Dec"
+    read as year 1, become NaT so the table is not mistaken for parsed rows.
+    """
+    text = pd.Series(values, dtype="object").fillna("").astype(str).str.strip()
+    dates = pd.to_datetime(text, errors="coerce", format="ISO8601")
+    missing = dates.isna() & (text != "")
+    if not missing.any():
+        return _plausible_dates(dates)
+    rest = text[missing]
+    with warnings.catch_warnings():
+        # Both readings are tried on purpose, so pandas' warning that one contradicts the inferred format is noise
+        warnings.simplefilter("ignore", UserWarning)
+        month_first = pd.to_datetime(rest, errors="coerce")
+        day_first = pd.to_datetime(rest, errors="coerce", dayfirst=True)
+    use_day_first = day_first.notna().sum() > month_first.notna().sum()
+    dates[missing] = day_first if use_day_first else month_first
+    missing = dates.isna() & (text != "")
+    if missing.any():
+        dates[missing] = pd.to_datetime(text[missing], errors="coerce", format="mixed", dayfirst=use_day_first)
+    return _plausible_dates(dates)
+
+
+def _plausible_dates(dates):
+    # Out-of-range years would also overflow the nanosecond timestamps the parquet schema stores
+    return dates.where(dates.dt.year >= MIN_DATE_YEAR).astype("datetime64[ns]")
+
+
+def match_columns(columns):
+    lookup = {str(col).strip().lower(): col for col in columns}
+    matched = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lookup:
+                matched[field] = lookup[alias]
+                break
+    return matched
+
+
+def has_transaction_columns(columns):
+    """Whether matched columns include a date and an amount, or debit/credit, column."""
+    return "date" in columns and ("amount" in columns or "debit" in columns or "credit" in columns)
+
+
+def normalize_table(df, table_index=0):
+    """Map a raw statement table onto TRANSACTION_COLUMNS, or return None if it holds no transactions."""
+    columns = match_columns(df.columns)
+    if df.empty or not has_transaction_columns(columns):
+        return None
+
+    if "amount" in columns:
+        amount = coerce_amounts(df[columns["amount"]])
+    else:
+        debit = coerce_amounts(df[columns["debit"]]).abs() if "debit" in columns else 0.0
+        credit = coerce_amounts(df[columns["credit"]]).abs() if "credit" in columns else 0.0
+        amount = pd.Series(credit, index=df.index).fillna(0.0) - pd.Series(debit, index=df.index).fillna(0.0)
+
+    frame = pd.DataFrame({
+        "date": coerce_dates(df[columns["date"]]),
+        "description": df[columns["description"]].astype(str).str.strip() if "description" in columns else "",
+        "amount": amount.values,
+        "balance": coerce_amounts(df[columns["balance"]]).values if "balance" in columns else np.nan,
+        "category": df[columns["category"]].astype(str).str.strip() if "category" in columns else None,
+        "table": table_index,
+    }, index=df.index)
+    frame = frame[frame["date"].notna() & frame["amount"].notna()]
+    frame["direction"] = np.where(frame["amount"] >= 0, "credit", "debit")
+    return frame[TRANSACTION_COLUMNS].reset_index(drop=True)
+
+
+def empty_transaction_frame():
+    frame = pd.DataFrame({col: pd.Series(dtype="object") for col in TRANSACTION_COLUMNS})
+    return frame.astype({"date": "datetime64[ns]", "amount": "float64", "balance": "float64", "table": "int64"})
+
+
+def build_transaction_frame(tables, start_index=0):
+    """Parse markdown tables once into a single typed transaction frame.
+
+    start_index numbers the tables when they continue an earlier batch.
+    """
+    frames = []
+    unparsed = 0
+    for i, table in enumerate(tables, start_index):
+        try:
+            parsed = parse_markdown_table(table)
+        except (IndexError, ValueError):
+            continue
+        unparsed += parsed.attrs["unparsed_rows"]
+        frame = normalize_table(parsed, i)
+        if frame is not None and not frame.empty:
+            frames.append(frame)
+    result = pd.concat(frames, ignore_index=True) if frames else empty_transaction_frame()
+    result.attrs["unparsed_rows"] = unparsed
+    return result
+
+
+def save_transactions(frame, path):
+    frame.to_parquet(path, index=False)
+    return path
+
+
+def load_transactions(path, tables=None):
+    """Load the transaction frame, or only the rows of the given table indices."""
+    if tables is None:
+        return pd.read_parquet(path)
+    return pd.read_parquet(path, filters=[("table", "in", list(tables))])
+
+
+class TransactionWriter:
+    """Appends transaction frames to a parquet file one row group at a time.
+
+    Lets a statement be written page by page without ever holding every
+    transaction in memory; the file reads back as one frame.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._writer = pq.ParquetWriter(path, TRANSACTION_SCHEMA)
+
+    def append(self, frame):
+        if frame.empty:
+            return
+        self._writer.write_table(pa.Table.from_pandas(frame[TRANSACTION_COLUMNS], schema=TRANSACTION_SCHEMA,
+                                                      preserve_index=False))
+        self.rows += len(frame)
+
+    def close(self):
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_transaction_tables(path):
+    """Yield (table_index, rows) from a saved frame, reading one row group at a time."""
+    parquet_file = pq.ParquetFile(path)
+    pending_index, pending = None, []
+    for group in range(parquet_file.num_row_groups):
+        frame = parquet_file.read_row_group(group).to_pandas()
+        for index, rows in frame.groupby("table", sort=False):
+            if pending and index != pending_index:
+                yield pending_index, pd.concat(pending, ignore_index=True)
+                pending = []
+            pending_index = index
+            pending.append(rows)
+    if pending:
+        yield pending_index, pd.concat(pending, ignore_index=True)
+
+
+def frame_to_prompt(frame):
+    """Render transactions as compact CSV, which is far shorter than the original markdown table."""
+    compact = pd.DataFrame({
+        "date": frame["date"].dt.strftime("%Y-%m-%d"),
+        "description": frame["description"],
+        "amount": frame["amount"].map("{:.2f}".format),
+    })
+    if frame["balance"].notna().any():
+        compact["balance"] = frame["balance"].map(lambda value: "" if pd.isna(value) else f"{value:.2f}")
+    return compact.to_csv(index=False).strip()
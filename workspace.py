@@ -0,0 +1,62 @@
+import os
+import re
+import shutil
+import threading
+import time
+
+LAST_USED_FILE = ".last_used"
+
+
+class WorkspaceManager:
+    """Gives every session its own scratch directory under root.
+
+    Each workspace records when it was last used; workspaces idle for longer
+    than ttl seconds (abandoned tabs, crashed runs) are removed by
+    collect_garbage, which runs at most once per gc_interval.
+    """
+
+    def __init__(self, root="workspaces", ttl=3600, gc_interval=300):
+        self.root = root
+        self.ttl = ttl
+        self.gc_interval = gc_interval
+        self._last_gc = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, owner):
+        # Owner IDs come from session state, so keep them to one safe path component
+        return os.path.join(self.root, re.sub(r"[^A-Za-z0-9_-]", "_", str(owner)))
+
+    def touch(self, owner):
+        """Create the owner's workspace if needed and mark it as in use."""
+        path = self.path(owner)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, LAST_USED_FILE), "w", encoding="utf-8") as file:
+            file.write(str(time.time()))
+        return path
+
+    def last_used(self, path):
+        try:
+            return os.path.getmtime(os.path.join(path, LAST_USED_FILE))
+        except OSError:
+            return os.path.getmtime(path)
+
+    def collect_garbage(self, force=False):
+        """Remove workspaces idle for longer than ttl; returns how many were removed."""
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_gc < self.gc_interval:
+                return 0
+            self._last_gc = now
+
+        removed = 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                expired = os.path.isdir(path) and now - self.last_used(path) > self.ttl
+            except OSError:
+                continue
+            if expired:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed